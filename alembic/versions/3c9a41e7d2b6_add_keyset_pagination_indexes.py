@@ -0,0 +1,29 @@
+"""add keyset pagination indexes
+
+Revision ID: 3c9a41e7d2b6
+Revises: 7f8630940e45
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a41e7d2b6'
+down_revision: Union[str, None] = '7f8630940e45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Composite indexes matching the (date, id) / (time, id) keyset order of the paginated endpoints
+    op.create_index('ix_recycle_date_id', 'recycle', ['date', 'id'], unique=False)
+    op.create_index('ix_schedules_time_id', 'schedules', ['time', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_schedules_time_id', table_name='schedules')
+    op.drop_index('ix_recycle_date_id', table_name='recycle')
@@ -0,0 +1,37 @@
+"""drop duplicate id indexes
+
+Revision ID: 5e2d7b1a9c40
+Revises: d84f2a6c1e07
+Create Date: 2026-10-18 16:48:52.904133
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2d7b1a9c40'
+down_revision: Union[str, None] = 'd84f2a6c1e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 7b2fb6b0dc54 dropped the recycle primary key along with the old iid column, leaving
+    # ix_recycle_id as the only index on id. Restore the key before dropping that index.
+    if not sa.inspect(op.get_bind()).get_pk_constraint('recycle')['constrained_columns']:
+        op.create_primary_key('recycle_pkey', 'recycle', ['id'])
+
+    # Each primary key already has its own unique btree
+    op.drop_index('ix_recycle_id', table_name='recycle')
+    op.drop_index('ix_reports_id', table_name='reports')
+    op.drop_index('ix_schedules_id', table_name='schedules')
+
+
+def downgrade() -> None:
+    # recycle_pkey is kept: the schema without it was never intended
+    op.create_index('ix_schedules_id', 'schedules', ['id'], unique=False)
+    op.create_index('ix_reports_id', 'reports', ['id'], unique=False)
+    op.create_index('ix_recycle_id', 'recycle', ['id'], unique=False)
@@ -0,0 +1,27 @@
+"""add rollup schedule index
+
+Revision ID: 6a0d3b8e4f15
+Revises: 9c1e5f3a7b28
+Create Date: 2026-10-18 16:47:12.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a0d3b8e4f15'
+down_revision: Union[str, None] = '9c1e5f3a7b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Schedule totals for a page or a single schedule read only that schedule's buckets
+    op.create_index('ix_recycle_daily_rollup_schedule_id', 'recycle_daily_rollup', ['schedule_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_recycle_daily_rollup_schedule_id', table_name='recycle_daily_rollup')
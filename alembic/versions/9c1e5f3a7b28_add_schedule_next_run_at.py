@@ -0,0 +1,30 @@
+"""add schedule next_run_at
+
+Revision ID: 9c1e5f3a7b28
+Revises: 5e2d7b1a9c40
+Create Date: 2026-10-18 16:02:44.918305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1e5f3a7b28'
+down_revision: Union[str, None] = '5e2d7b1a9c40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled in by `python -m app.maintenance.schedules advance --missing`, which has
+    # the recurrence rules; rows whose day/frequency do not parse stay NULL
+    op.add_column('schedules', sa.Column('next_run_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_schedules_next_run_at', 'schedules', ['next_run_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_schedules_next_run_at', table_name='schedules')
+    op.drop_column('schedules', 'next_run_at')
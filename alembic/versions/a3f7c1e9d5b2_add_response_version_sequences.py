@@ -0,0 +1,30 @@
+"""add response version sequences
+
+Revision ID: a3f7c1e9d5b2
+Revises: e8d2f6b4a1c9
+Create Date: 2026-10-18 23:36:41.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f7c1e9d5b2'
+down_revision: Union[str, None] = 'e8d2f6b4a1c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Resources whose responses app.services.response_cache caches
+RESOURCES = ('recycles', 'reports', 'schedules')
+
+
+def upgrade() -> None:
+    for resource in RESOURCES:
+        op.execute(f'CREATE SEQUENCE response_version_{resource} AS bigint')
+
+
+def downgrade() -> None:
+    for resource in RESOURCES:
+        op.execute(f'DROP SEQUENCE response_version_{resource}')
@@ -0,0 +1,44 @@
+"""add recycle daily rollup
+
+Revision ID: a51e0c7b94d3
+Revises: 3c9a41e7d2b6
+Create Date: 2026-10-18 11:03:27.642915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a51e0c7b94d3'
+down_revision: Union[str, None] = '3c9a41e7d2b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('recycle_daily_rollup',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('schedule_id', sa.UUID(), nullable=False),
+    sa.Column('total_quantity', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'type', 'schedule_id')
+    )
+
+    # Backfill from the existing logs; from here on the recycle services maintain it
+    op.execute(
+        """
+        INSERT INTO recycle_daily_rollup (day, type, schedule_id, total_quantity, count)
+        SELECT (date AT TIME ZONE 'UTC')::date, type, schedule_id, sum(quantity), count(*)
+        FROM recycle
+        WHERE schedule_id IS NOT NULL
+        GROUP BY 1, 2, 3
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('recycle_daily_rollup')
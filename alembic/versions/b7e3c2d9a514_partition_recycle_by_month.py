@@ -0,0 +1,94 @@
+"""partition recycle by month
+
+Revision ID: b7e3c2d9a514
+Revises: 6a0d3b8e4f15
+Create Date: 2026-10-18 17:26:51.663042
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3c2d9a514'
+down_revision: Union[str, None] = '6a0d3b8e4f15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months created past the current one; app.maintenance.partitions keeps this horizon afterwards
+MONTHS_AHEAD = 3
+
+COLUMNS = 'id, type, quantity, date, schedule_id'
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes(primary_key: str) -> None:
+    op.execute(f'ALTER TABLE recycle ADD CONSTRAINT recycle_pkey PRIMARY KEY ({primary_key})')
+    op.create_index('ix_recycle_date_id', 'recycle', ['date', 'id'], unique=False)
+    op.create_index('ix_recycle_schedule_id_date', 'recycle', ['schedule_id', 'date'], unique=False)
+    op.create_index('ix_recycle_type_date', 'recycle', ['type', 'date'], unique=False)
+    op.create_foreign_key('fk_recycle_schedule', 'recycle', 'schedules', ['schedule_id'], ['id'])
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    oldest = conn.execute(sa.text('SELECT min(date) FROM recycle')).scalar()
+    today = datetime.now(timezone.utc).date().replace(day=1)
+    month = (oldest.astimezone(timezone.utc).date() if oldest else today).replace(day=1)
+
+    op.execute('ALTER TABLE recycle RENAME TO recycle_unpartitioned')
+    op.execute(
+        """
+        CREATE TABLE recycle (
+            id uuid NOT NULL,
+            type varchar NOT NULL,
+            quantity double precision NOT NULL,
+            date timestamptz NOT NULL,
+            schedule_id uuid
+        ) PARTITION BY RANGE (date)
+        """
+    )
+
+    # One partition per UTC month holding data, up to MONTHS_AHEAD ahead; anything else lands in the default
+    last = _add_months(today, MONTHS_AHEAD)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE recycle_p{month:%Y_%m} PARTITION OF recycle "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+        )
+        month = upper
+    op.execute('CREATE TABLE recycle_default PARTITION OF recycle DEFAULT')
+
+    op.execute(f'INSERT INTO recycle ({COLUMNS}) SELECT {COLUMNS} FROM recycle_unpartitioned')
+    op.execute('DROP TABLE recycle_unpartitioned')
+
+    # The partition key has to be part of every unique constraint on a partitioned table
+    _create_indexes('id, date')
+    op.execute('ANALYZE recycle')
+
+
+def downgrade() -> None:
+    # Partitions that were detached or archived are not brought back
+    op.execute('ALTER TABLE recycle RENAME TO recycle_partitioned')
+    op.execute(
+        """
+        CREATE TABLE recycle (
+            id uuid NOT NULL,
+            type varchar NOT NULL,
+            quantity double precision NOT NULL,
+            date timestamptz NOT NULL,
+            schedule_id uuid
+        )
+        """
+    )
+    op.execute(f'INSERT INTO recycle ({COLUMNS}) SELECT {COLUMNS} FROM recycle_partitioned')
+    op.execute('DROP TABLE recycle_partitioned CASCADE')
+    _create_indexes('id')
@@ -0,0 +1,202 @@
+"""dictionary encode recycle and schedule values
+
+Revision ID: c6e1a8f3b5d7
+Revises: f2a9c4e7b1d3
+Create Date: 2026-10-18 21:03:27.518406
+
+"""
+from typing import Sequence, Union
+from uuid import UUID
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e1a8f3b5d7'
+down_revision: Union[str, None] = 'f2a9c4e7b1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows per backfill UPDATE; each batch commits on its own
+BATCH_SIZE = 10000
+
+# table -> (string column, lookup table); the id is stored in <column>_id
+ENCODED = {
+    'recycle': [('type', 'recycle_types')],
+    'schedules': [('day', 'schedule_days'), ('frequency', 'schedule_frequencies')],
+}
+
+
+def _add_names(conn, lookup: str, names: str) -> None:
+    """Insert the names selected by `names` that `lookup` does not have yet.
+
+    Filtering out existing names first keeps the id sequence from advancing for them:
+    ON CONFLICT alone would spend an id per candidate row, and the ids are smallints.
+    """
+    conn.execute(sa.text(
+        f'INSERT INTO {lookup} (name) SELECT name FROM ({names}) AS candidates (name) '
+        f'WHERE name IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {lookup} WHERE {lookup}.name = candidates.name) '
+        f'ON CONFLICT (name) DO NOTHING'
+    ))
+
+
+def _partitions(conn, table: str) -> list[str]:
+    """Leaf partitions of `table`, or just `table` when it is not partitioned."""
+    return conn.execute(sa.text(
+        'SELECT relid::regclass::text FROM pg_partition_tree(CAST(:table AS regclass)) WHERE isleaf ORDER BY 1'
+    ), {'table': table}).scalars().all()
+
+
+def _backfill(conn, table: str) -> None:
+    columns = ENCODED[table]
+    assignments = ', '.join(f'{column}_id = {lookup}.id' for column, lookup in columns)
+    lookups = ', '.join(lookup for _, lookup in columns)
+    joins = ' AND '.join(f'{lookup}.name = {table}.{column}' for column, lookup in columns)
+    missing = ' OR '.join(f'{table}.{column}_id IS NULL' for column, _ in columns)
+    # Keyset batches in id order, so every batch is an index range scan
+    after = UUID(int=0)
+    while True:
+        upper = conn.execute(
+            sa.text(f'SELECT id FROM {table} WHERE id > :after ORDER BY id OFFSET :offset LIMIT 1'),
+            {'after': after, 'offset': BATCH_SIZE - 1},
+        ).scalar()
+        where = f'{table}.id > :after' + ('' if upper is None else f' AND {table}.id <= :upper')
+        conn.execute(
+            sa.text(f'UPDATE {table} SET {assignments} FROM {lookups} WHERE {joins} AND ({missing}) AND {where}'),
+            {'after': after, 'upper': upper},
+        )
+        if upper is None:
+            return
+        after = upper
+
+
+def upgrade() -> None:
+    for lookup in ('recycle_types', 'schedule_days', 'schedule_frequencies'):
+        op.create_table(lookup,
+        sa.Column('id', sa.SmallInteger(), autoincrement=True, nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+        )
+    op.add_column('recycle', sa.Column('type_id', sa.SmallInteger(), nullable=True))
+    op.add_column('schedules', sa.Column('day_id', sa.SmallInteger(), nullable=True))
+    op.add_column('schedules', sa.Column('frequency_id', sa.SmallInteger(), nullable=True))
+
+    # While the previous release keeps writing names, a trigger fills in the ids of
+    # every row it inserts or updates, so the backfill needs no catch-up pass under a lock
+    for table, columns in ENCODED.items():
+        body = ''.join(
+            f"""
+            IF TG_OP = 'INSERT' OR NEW.{column} IS DISTINCT FROM OLD.{column} THEN
+                INSERT INTO {lookup} (name) SELECT NEW.{column}
+                WHERE NOT EXISTS (SELECT 1 FROM {lookup} WHERE name = NEW.{column}) ON CONFLICT (name) DO NOTHING;
+                NEW.{column}_id := (SELECT id FROM {lookup} WHERE name = NEW.{column});
+            END IF;"""
+            for column, lookup in columns
+        )
+        op.execute(f'CREATE FUNCTION {table}_encode_names() RETURNS trigger LANGUAGE plpgsql AS $$\n'
+                   f'BEGIN{body}\n    RETURN NEW;\nEND\n$$')
+        op.execute(f'CREATE TRIGGER encode_names BEFORE INSERT OR UPDATE ON {table} '
+                   f'FOR EACH ROW EXECUTE FUNCTION {table}_encode_names()')
+
+    # Committed steps outside the migration transaction, so the tables stay writable:
+    # the backfill commits batch by batch, constraints are added NOT VALID and then
+    # validated (which scans without blocking writes), and the index is built
+    # concurrently per partition before being attached to the partitioned index
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        for table, columns in ENCODED.items():
+            for column, lookup in columns:
+                _add_names(conn, lookup, f'SELECT DISTINCT {column} FROM {table}')
+            _backfill(conn, table)
+
+        for table, columns in ENCODED.items():
+            partitions = _partitions(conn, table)
+            for column, lookup in columns:
+                check = f'ck_{table}_{column}_id_not_null'
+                conn.execute(sa.text(f'ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column}_id IS NOT NULL) NOT VALID'))
+                conn.execute(sa.text(f'ALTER TABLE {table} VALIDATE CONSTRAINT {check}'))
+                # A partitioned table takes no NOT VALID foreign key: each partition gets
+                # its own, and adding the key to the parent afterwards adopts them unscanned
+                for partition in partitions:
+                    conn.execute(sa.text(
+                        f'ALTER TABLE {partition} ADD CONSTRAINT fk_{table}_{column} '
+                        f'FOREIGN KEY ({column}_id) REFERENCES {lookup} (id) NOT VALID'
+                    ))
+                    conn.execute(sa.text(f'ALTER TABLE {partition} VALIDATE CONSTRAINT fk_{table}_{column}'))
+                if partitions != [table]:
+                    conn.execute(sa.text(
+                        f'ALTER TABLE {table} ADD CONSTRAINT fk_{table}_{column} '
+                        f'FOREIGN KEY ({column}_id) REFERENCES {lookup} (id)'
+                    ))
+
+        conn.execute(sa.text('CREATE INDEX ix_recycle_type_id_date ON ONLY recycle (type_id, date)'))
+        for partition in _partitions(conn, 'recycle'):
+            conn.execute(sa.text(
+                f'CREATE INDEX CONCURRENTLY {partition}_type_id_date_idx ON {partition} (type_id, date)'
+            ))
+            conn.execute(sa.text(f'ALTER INDEX ix_recycle_type_id_date ATTACH PARTITION {partition}_type_id_date_idx'))
+
+    # Catalog-only from here: SET NOT NULL relies on the validated checks instead of scanning.
+    # recycle is locked before the rollup, in the order the previous release's writes take them
+    for table, columns in ENCODED.items():
+        op.execute(f'DROP TRIGGER encode_names ON {table}')
+        op.execute(f'DROP FUNCTION {table}_encode_names()')
+        for column, _ in columns:
+            op.alter_column(table, f'{column}_id', nullable=False)
+            op.drop_constraint(f'ck_{table}_{column}_id_not_null', table, type_='check')
+    op.drop_index('ix_recycle_type_date', table_name='recycle')
+    op.drop_column('recycle', 'type')
+    op.drop_column('schedules', 'day')
+    op.drop_column('schedules', 'frequency')
+
+    # The rollup is small: converted in one statement
+    _add_names(op.get_bind(), 'recycle_types', 'SELECT DISTINCT type FROM recycle_daily_rollup')
+    op.add_column('recycle_daily_rollup', sa.Column('type_id', sa.SmallInteger(), nullable=True))
+    op.execute(
+        'UPDATE recycle_daily_rollup SET type_id = recycle_types.id '
+        'FROM recycle_types WHERE recycle_types.name = recycle_daily_rollup.type'
+    )
+    op.alter_column('recycle_daily_rollup', 'type_id', nullable=False)
+    op.drop_constraint('recycle_daily_rollup_pkey', 'recycle_daily_rollup', type_='primary')
+    op.create_primary_key('recycle_daily_rollup_pkey', 'recycle_daily_rollup', ['day', 'type_id', 'schedule_id'])
+    op.drop_column('recycle_daily_rollup', 'type')
+
+    with op.get_context().autocommit_block():
+        op.execute('ANALYZE recycle, schedules, recycle_daily_rollup')
+
+
+def downgrade() -> None:
+    op.add_column('recycle_daily_rollup', sa.Column('type', sa.String(), nullable=True))
+    op.execute(
+        'UPDATE recycle_daily_rollup SET type = recycle_types.name '
+        'FROM recycle_types WHERE recycle_types.id = recycle_daily_rollup.type_id'
+    )
+    op.alter_column('recycle_daily_rollup', 'type', nullable=False)
+    op.drop_constraint('recycle_daily_rollup_pkey', 'recycle_daily_rollup', type_='primary')
+    op.create_primary_key('recycle_daily_rollup_pkey', 'recycle_daily_rollup', ['day', 'type', 'schedule_id'])
+    op.drop_column('recycle_daily_rollup', 'type_id')
+
+    op.add_column('recycle', sa.Column('type', sa.String(), nullable=True))
+    op.add_column('schedules', sa.Column('day', sa.String(), nullable=True))
+    op.add_column('schedules', sa.Column('frequency', sa.String(), nullable=True))
+    for table, columns in ENCODED.items():
+        assignments = ', '.join(f'{column} = {lookup}.name' for column, lookup in columns)
+        lookups = ', '.join(lookup for _, lookup in columns)
+        joins = ' AND '.join(f'{lookup}.id = {table}.{column}_id' for column, lookup in columns)
+        op.execute(f'UPDATE {table} SET {assignments} FROM {lookups} WHERE {joins}')
+    op.alter_column('recycle', 'type', nullable=False)
+    op.alter_column('schedules', 'day', nullable=False)
+    op.alter_column('schedules', 'frequency', nullable=False)
+    op.drop_index('ix_recycle_type_id_date', table_name='recycle')
+    op.create_index('ix_recycle_type_date', 'recycle', ['type', 'date'], unique=False)
+    op.drop_constraint('fk_recycle_type', 'recycle', type_='foreignkey')
+    op.drop_constraint('fk_schedules_day', 'schedules', type_='foreignkey')
+    op.drop_constraint('fk_schedules_frequency', 'schedules', type_='foreignkey')
+    op.drop_column('recycle', 'type_id')
+    op.drop_column('schedules', 'day_id')
+    op.drop_column('schedules', 'frequency_id')
+    op.drop_table('schedule_frequencies')
+    op.drop_table('schedule_days')
+    op.drop_table('recycle_types')
@@ -0,0 +1,36 @@
+"""add report search vector
+
+Revision ID: d4f8a1c6e2b9
+Revises: b7e3c2d9a514
+Create Date: 2026-10-18 19:05:41.873206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f8a1c6e2b9'
+down_revision: Union[str, None] = 'b7e3c2d9a514'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Stored generated column: Postgres fills it for existing rows (rewriting the table
+    # once) and keeps it in step with type and data on every write
+    op.add_column('reports', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed("setweight(to_tsvector('english', type), 'A') || setweight(to_tsvector('english', data), 'B')",
+                    persisted=True),
+        nullable=True,
+    ))
+    op.create_index('ix_reports_search_vector', 'reports', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reports_search_vector', table_name='reports', postgresql_using='gin')
+    op.drop_column('reports', 'search_vector')
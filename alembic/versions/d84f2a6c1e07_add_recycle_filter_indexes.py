@@ -0,0 +1,29 @@
+"""add recycle filter indexes
+
+Revision ID: d84f2a6c1e07
+Revises: a51e0c7b94d3
+Create Date: 2026-10-18 14:21:05.387611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd84f2a6c1e07'
+down_revision: Union[str, None] = 'a51e0c7b94d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filters on schedule_id / type with an optional date range; date-only ranges use ix_recycle_date_id
+    op.create_index('ix_recycle_schedule_id_date', 'recycle', ['schedule_id', 'date'], unique=False)
+    op.create_index('ix_recycle_type_date', 'recycle', ['type', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_recycle_type_date', table_name='recycle')
+    op.drop_index('ix_recycle_schedule_id_date', table_name='recycle')
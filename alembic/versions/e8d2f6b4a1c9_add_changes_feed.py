@@ -0,0 +1,101 @@
+"""add changes feed
+
+Revision ID: e8d2f6b4a1c9
+Revises: c6e1a8f3b5d7
+Create Date: 2026-10-18 22:41:05.206913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8d2f6b4a1c9'
+down_revision: Union[str, None] = 'c6e1a8f3b5d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> feed resource name
+TRACKED = {'recycle': 'recycles', 'schedules': 'schedules'}
+
+
+def upgrade() -> None:
+    op.execute('CREATE SEQUENCE changes_seq AS bigint')
+
+    # Every insert and update moves the row to the end of the feed
+    op.execute(
+        """
+        CREATE FUNCTION track_change() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.updated_at := now();
+            NEW.change_xid := pg_current_xact_id()::text::bigint;
+            NEW.change_seq := nextval('changes_seq');
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    # Statement level, so a row moved to another partition by an UPDATE (internally a
+    # delete and an insert) and rows moved by partition maintenance leave no tombstone
+    op.execute(
+        """
+        CREATE FUNCTION record_tombstones() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO change_tombstones (resource, change_xid, change_seq, id)
+            SELECT TG_ARGV[0], pg_current_xact_id()::text::bigint, nextval('changes_seq'), id FROM deleted;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+
+    op.create_table('change_tombstones',
+    sa.Column('resource', sa.String(length=32), nullable=False),
+    sa.Column('change_xid', sa.BigInteger(), nullable=False),
+    sa.Column('change_seq', sa.BigInteger(), nullable=False),
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('resource', 'change_xid', 'change_seq', 'id')
+    )
+    op.create_table('change_feed_horizons',
+    sa.Column('resource', sa.String(length=32), nullable=False),
+    sa.Column('change_xid', sa.BigInteger(), nullable=False),
+    sa.Column('change_seq', sa.BigInteger(), nullable=False),
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.PrimaryKeyConstraint('resource')
+    )
+
+    for table, resource in TRACKED.items():
+        # Constant defaults and no defaults are catalog-only changes: existing rows are
+        # not rewritten. They keep a null created_at/updated_at and sit at position (0, 0)
+        op.add_column(table, sa.Column('created_at', sa.DateTime(timezone=True), nullable=True))
+        op.alter_column(table, 'created_at', server_default=sa.text('now()'))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+        op.add_column(table, sa.Column('change_xid', sa.BigInteger(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+        op.alter_column(table, 'change_xid', server_default=None)
+        op.alter_column(table, 'change_seq', server_default=None)
+        op.create_index(f'ix_{table}_change_position', table, ['change_xid', 'change_seq', 'id'], unique=False)
+
+        op.execute(f'CREATE TRIGGER track_change BEFORE INSERT OR UPDATE ON {table} '
+                   f'FOR EACH ROW EXECUTE FUNCTION track_change()')
+        op.execute(f'CREATE TRIGGER record_tombstones AFTER DELETE ON {table} REFERENCING OLD TABLE AS deleted '
+                   f"FOR EACH STATEMENT EXECUTE FUNCTION record_tombstones('{resource}')")
+
+
+def downgrade() -> None:
+    for table in TRACKED:
+        op.execute(f'DROP TRIGGER record_tombstones ON {table}')
+        op.execute(f'DROP TRIGGER track_change ON {table}')
+        op.drop_index(f'ix_{table}_change_position', table_name=table)
+        op.drop_column(table, 'change_seq')
+        op.drop_column(table, 'change_xid')
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'created_at')
+    op.drop_table('change_feed_horizons')
+    op.drop_table('change_tombstones')
+    op.execute('DROP FUNCTION record_tombstones()')
+    op.execute('DROP FUNCTION track_change()')
+    op.execute('DROP SEQUENCE changes_seq')
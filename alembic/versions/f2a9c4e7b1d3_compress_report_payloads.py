@@ -0,0 +1,57 @@
+"""compress report payloads
+
+Revision ID: f2a9c4e7b1d3
+Revises: d4f8a1c6e2b9
+Create Date: 2026-10-18 20:12:09.336174
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a9c4e7b1d3'
+down_revision: Union[str, None] = 'd4f8a1c6e2b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows stay plain; `python -m app.maintenance.reports compress` moves them over
+    op.add_column('reports', sa.Column('data_compressed', sa.LargeBinary(), nullable=True))
+    op.add_column('reports', sa.Column('data_codec', sa.String(length=8), nullable=True))
+    op.add_column('reports', sa.Column('data_size', sa.Integer(), nullable=True))
+    op.alter_column('reports', 'data', existing_type=sa.Text(), nullable=True)
+    op.create_check_constraint('ck_reports_payload', 'reports', '(data IS NULL) <> (data_compressed IS NULL)')
+    # Already compressed: store out of line without another pglz pass
+    op.execute("ALTER TABLE reports ALTER COLUMN data_compressed SET STORAGE EXTERNAL")
+    # Postgres cannot read compressed payloads, so the report service writes the vector
+    # from now on; the values computed so far are kept
+    op.execute("ALTER TABLE reports ALTER COLUMN search_vector DROP EXPRESSION")
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    compressed = connection.execute(sa.text("SELECT count(*) FROM reports WHERE data_codec IS NOT NULL")).scalar_one()
+    if compressed:
+        raise RuntimeError(f"{compressed} reports are stored compressed; "
+                           "run `python -m app.maintenance.reports decompress` first")
+
+    op.drop_index('ix_reports_search_vector', table_name='reports', postgresql_using='gin')
+    op.drop_column('reports', 'search_vector')
+    op.add_column('reports', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed("setweight(to_tsvector('english', type), 'A') || setweight(to_tsvector('english', data), 'B')",
+                    persisted=True),
+        nullable=True,
+    ))
+    op.create_index('ix_reports_search_vector', 'reports', ['search_vector'], unique=False, postgresql_using='gin')
+
+    op.drop_constraint('ck_reports_payload', 'reports', type_='check')
+    op.alter_column('reports', 'data', existing_type=sa.Text(), nullable=False)
+    op.drop_column('reports', 'data_size')
+    op.drop_column('reports', 'data_codec')
+    op.drop_column('reports', 'data_compressed')
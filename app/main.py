@@ -1,7 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import recycle, report, schedule
-from app.database import test_connection  # Import the test_connection function
+from app.database import test_connection, ReadYourWritesMiddleware  # Import the test_connection function
+from app.metrics import MetricsMiddleware, metrics_response
+from app.services.ingest import ingest_buffer
+from app.services.recycle_analytics import recycle_analytics
+from app.config import settings
 
 app = FastAPI()
 
@@ -13,14 +17,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Marks responses to requests that wrote, so the client's next reads skip the replica
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Outermost middleware, so latency covers CORS handling as well
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(recycle.router, prefix="/recycles", tags=["Recycles"])
 app.include_router(report.router, prefix="/reports", tags=["Reports"])
 app.include_router(schedule.router, prefix="/schedules", tags=["Schedules"])
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text exposition of request, query, pool and cache metrics
+    return metrics_response()
+
+
 # Use app.lifecycle to handle startup events
 @app.on_event("startup")
 async def on_startup():
     print("🟡 Testing database connection...")
     await test_connection()  # Test the database connection at startup
     print("🟢 Database connection test completed.")
+    if settings.recycle_ingest_buffered:
+        ingest_buffer.start()
+    if settings.recycle_analytics_enabled:
+        # Warm the columnar snapshot before the first analytics request
+        await recycle_analytics.ensure_fresh()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Write out every recycle log the buffer has already acknowledged
+    await ingest_buffer.stop()
+    await recycle_analytics.stop()
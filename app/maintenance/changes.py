@@ -0,0 +1,88 @@
+"""
+Pruning for the tombstones behind the /changes feeds.
+
+Every deleted recycle log or schedule leaves a tombstone so that syncing clients
+learn about the delete. `prune` drops tombstones older than the retention window, in
+feed order and one committed batch at a time, and moves the resource's horizon up to
+the last one dropped; a token from before the horizon is answered with 410 and the
+client syncs again from scratch:
+
+    python -m app.maintenance.changes prune --older-than-days 30
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+from itertools import takewhile
+from typing import Optional
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import build_engine
+from app.models.changes import ChangeFeedHorizon, ChangeTombstone
+
+BATCH_SIZE = 5000
+RESOURCES = ("recycles", "schedules")
+
+tombstones = ChangeTombstone.__table__
+horizons = ChangeFeedHorizon.__table__
+
+
+async def prune_tombstones(engine: AsyncEngine, resource: str, older_than_days: Optional[int] = None,
+                           batch_size: int = BATCH_SIZE) -> dict:
+    """Drop the tombstones of `resource` older than `older_than_days` (the configured retention by default)."""
+    older_than_days = settings.changes_tombstone_retention_days if older_than_days is None else older_than_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    position = tuple_(tombstones.c.change_xid, tombstones.c.change_seq, tombstones.c.id)
+    totals = {"tombstones": 0}
+    while True:
+        async with engine.begin() as conn:
+            # Stops at the first tombstone inside the window, so the horizon never passes a kept one
+            rows = (await conn.execute(
+                select(tombstones.c.change_xid, tombstones.c.change_seq, tombstones.c.id, tombstones.c.deleted_at)
+                .where(tombstones.c.resource == resource)
+                .order_by(tombstones.c.change_xid, tombstones.c.change_seq, tombstones.c.id)
+                .limit(batch_size)
+            )).all()
+            expired = list(takewhile(lambda row: row.deleted_at < cutoff, rows))
+            if not expired:
+                return totals
+            last = expired[-1]
+
+            await conn.execute(
+                delete(tombstones).where(tombstones.c.resource == resource,
+                                         position <= tuple_(last.change_xid, last.change_seq, last.id))
+            )
+            stmt = insert(horizons).values(resource=resource, change_xid=last.change_xid,
+                                           change_seq=last.change_seq, id=last.id)
+            await conn.execute(stmt.on_conflict_do_update(
+                index_elements=[horizons.c.resource],
+                set_={"change_xid": stmt.excluded.change_xid, "change_seq": stmt.excluded.change_seq,
+                      "id": stmt.excluded.id},
+            ))
+            totals["tombstones"] += len(expired)
+            if len(expired) < batch_size:
+                return totals
+
+
+async def main(args):
+    engine = build_engine(poolclass=NullPool, name="maintenance", statement_timeout_ms=0)
+    try:
+        for resource in args.resource or RESOURCES:
+            totals = await prune_tombstones(engine, resource, args.older_than_days, args.batch_size)
+            print(f"prune {resource}: {totals['tombstones']} tombstone(s)")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    prune = commands.add_parser("prune", help="Drop tombstones older than the retention window")
+    prune.add_argument("--older-than-days", type=int, help="Default: WMS_CHANGES_TOMBSTONE_RETENTION_DAYS")
+    prune.add_argument("--resource", choices=RESOURCES, action="append", help="Default: all")
+    prune.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,74 @@
+"""
+Replay of recycle logs the ingest buffer could not write before shutting down.
+
+When the database does not take the buffered logs within WMS_RECYCLE_INGEST_DRAIN_TIMEOUT_S
+of a shutdown, the buffer saves them as NDJSON in WMS_RECYCLE_INGEST_SPILL_DIR. `replay`
+writes such files with the ids the clients were already given, one committed batch at
+a time; logs that are already there (e.g. from a batch whose COMMIT landed as the
+process stopped) are skipped, so a file can be replayed again after a failure:
+
+    python -m app.maintenance.ingest replay recycle-ingest-20261018T120000Z-4242.ndjson
+"""
+import argparse
+import asyncio
+import json
+from types import SimpleNamespace
+from uuid import UUID
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.database import build_engine
+from app.models.recycle import Recycle
+from app.schemas.recycle import RecycleCreate
+from app.services.recycle import encode_recycles
+from app.services.response_cache import bump_version
+from app.services.rollup import RollupDeltas, apply_rollup_deltas
+
+BATCH_SIZE = 500
+
+
+async def replay_recycles(db: AsyncSession, items: list[dict]) -> int:
+    """Insert spilled logs ({id, type, quantity, date, schedule_id}) that are not there yet; commits."""
+    rows = await encode_recycles(db, [RecycleCreate.model_validate(item) for item in items])
+    for row, item in zip(rows, items):
+        row["id"] = UUID(str(item["id"]))
+    stmt = insert(Recycle).on_conflict_do_nothing(index_elements=[Recycle.id, Recycle.date])
+    inserted = set((await db.execute(stmt.returning(Recycle.id), rows)).scalars().all())
+
+    # Only the logs written now count towards the rollup
+    deltas = RollupDeltas()
+    for row in rows:
+        if row["id"] in inserted:
+            deltas.add(SimpleNamespace(**row))
+    await apply_rollup_deltas(db, deltas)
+    await db.commit()
+    if inserted:
+        await bump_version(db, "recycles")
+    return len(inserted)
+
+
+async def main(args):
+    engine = build_engine(poolclass=NullPool, name="maintenance", statement_timeout_ms=0)
+    try:
+        for path in args.files:
+            with open(path) as spill:
+                items = [json.loads(line) for line in spill if line.strip()]
+            written = 0
+            async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as db:
+                for start in range(0, len(items), args.batch_size):
+                    written += await replay_recycles(db, items[start:start + args.batch_size])
+            print(f"replay {path}: {written} of {len(items)} log(s) written, {len(items) - written} already there")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay = commands.add_parser("replay", help="Write the logs of spill files that are not in the table yet")
+    replay.add_argument("files", nargs="+")
+    replay.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
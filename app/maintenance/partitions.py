@@ -0,0 +1,251 @@
+"""
+Monthly partition maintenance for the `recycle` table.
+
+`ensure` creates the partitions for the current month and the next few, moving any
+rows that already landed in recycle_default for those months. `archive` detaches
+partitions older than the retention window, writes each one to a compressed file
+and drops it:
+
+    python -m app.maintenance.partitions ensure --months-ahead 3
+    python -m app.maintenance.partitions archive --older-than 24 --dir archive --format csv
+
+Archived months stay in recycle_daily_rollup, so /recycles/stats keeps covering them.
+Both commands advance the recycles response version once rows change partitions, so
+cached /recycles and /schedules responses are not served past them. Run `ensure` at
+least once a month, e.g. from cron.
+"""
+import argparse
+import asyncio
+import gzip
+import re
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Literal, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.pool import NullPool
+
+from app.database import build_engine
+from app.services.response_cache import bump_version
+
+PARENT = "recycle"
+DEFAULT_PARTITION = "recycle_default"
+MONTHS_AHEAD = 3
+RETENTION_MONTHS = 24
+
+# Rows per Parquet row group when archiving
+ARCHIVE_CHUNK_SIZE = 50000
+
+ArchiveFormat = Literal["csv", "parquet"]
+
+_PARTITION_NAME = re.compile(r"recycle_p(\d{4})_(\d{2})")
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_p{month:%Y_%m}"
+
+
+def _bound(month: date) -> datetime:
+    # Partition bounds are UTC month starts, matching the migration
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def _bounds_clause(month: date) -> str:
+    return f"FOR VALUES FROM ('{_bound(month).isoformat()}') TO ('{_bound(add_months(month, 1)).isoformat()}')"
+
+
+async def list_partitions(conn: AsyncConnection) -> dict[date, str]:
+    """Monthly partitions currently attached to `recycle`, keyed by month start."""
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:parent AS regclass)"
+        ),
+        {"parent": PARENT},
+    )
+    partitions = {}
+    for name in result.scalars():
+        match = _PARTITION_NAME.fullmatch(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+async def create_partition(conn: AsyncConnection, month: date) -> int:
+    """
+    Create the partition for `month`, returning how many rows were moved into it.
+
+    Postgres refuses to attach a range that the default partition still has rows
+    for, so those rows are copied into the new table and removed from the default
+    before it is attached, all within the caller's transaction.
+    """
+    name = partition_name(month)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    in_range = "date >= :lower AND date < :upper"
+    bounds = {"lower": lower, "upper": upper}
+
+    await conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = await conn.execute(
+        text(f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_range} RETURNING *) "
+             f"INSERT INTO {name} SELECT * FROM moved"),
+        bounds,
+    )
+    await conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} {_bounds_clause(month)}"))
+    return moved.rowcount
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int = MONTHS_AHEAD,
+                            today: Optional[date] = None) -> tuple[list[str], int]:
+    """
+    Create any missing partition from the current month to `months_ahead` months ahead.
+
+    Returns the partitions created and how many rows were moved out of the default
+    partition in total.
+    """
+    current = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    existing = await list_partitions(conn)
+    created, total = [], 0
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            moved = await create_partition(conn, month)
+            total += moved
+            created.append(f"{partition_name(month)} ({moved} rows moved from {DEFAULT_PARTITION})")
+    return created, total
+
+
+async def _bump_recycles(engine):
+    # Only after the partition change is committed, like every other recycles write
+    async with AsyncSession(engine) as db:
+        await bump_version(db, "recycles")
+
+
+def _archive_query(table: str) -> str:
+    # Archives carry the type name, so they can be read without the recycle_types table
+    return (
+        f"SELECT r.id::text AS id, t.name AS type, r.quantity, r.date, r.schedule_id::text AS schedule_id "
+        f"FROM {table} r JOIN recycle_types t ON t.id = r.type_id"
+    )
+
+
+async def _export_csv(conn: AsyncConnection, table: str, path: Path):
+    raw = await conn.get_raw_connection()
+    with gzip.open(path, "wb") as file:
+        async def write(chunk: bytes):
+            file.write(chunk)
+
+        # COPY streams the rows straight from the server without building them in Python
+        await raw.driver_connection.copy_from_query(_archive_query(table), output=write, format="csv", header=True)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Parquet archives need pyarrow; install it or use --format csv")
+
+
+async def _export_parquet(conn: AsyncConnection, table: str, path: Path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.string()), ("type", pa.string()), ("quantity", pa.float64()),
+        ("date", pa.timestamp("us", tz="UTC")), ("schedule_id", pa.string()),
+    ])
+    result = await conn.stream(
+        text(_archive_query(table))
+        .execution_options(yield_per=ARCHIVE_CHUNK_SIZE)
+    )
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        async for partition in result.partitions():
+            writer.write_table(pa.Table.from_pylist([row._asdict() for row in partition], schema=schema))
+
+
+async def archive_partitions(engine, older_than: int = RETENTION_MONTHS, directory: Path = Path("archive"),
+                             fmt: ArchiveFormat = "csv", keep_detached: bool = False,
+                             today: Optional[date] = None) -> list[str]:
+    """
+    Detach every monthly partition entirely older than `older_than` months and archive it.
+
+    Each partition is detached in its own transaction before it is exported, so
+    queries stop seeing it right away. The detached table is dropped only once its
+    archive file is complete, and kept when `keep_detached` is set; a failed export
+    attaches the partition again. The recycles response version is advanced after
+    each detach and re-attach.
+    """
+    if fmt == "parquet":
+        _require_pyarrow()
+
+    cutoff = add_months((today or datetime.now(timezone.utc).date()).replace(day=1), -older_than)
+    directory.mkdir(parents=True, exist_ok=True)
+    suffix = ".csv.gz" if fmt == "csv" else ".parquet"
+
+    async with engine.connect() as conn:
+        partitions = await list_partitions(conn)
+
+    archived = []
+    for month, name in sorted(partitions.items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        async with engine.begin() as conn:
+            await conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        await _bump_recycles(engine)
+
+        path = directory / f"{name}{suffix}"
+        partial = path.with_name(path.name + ".partial")
+        try:
+            async with engine.begin() as conn:
+                if fmt == "csv":
+                    await _export_csv(conn, name, partial)
+                else:
+                    await _export_parquet(conn, name, partial)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            async with engine.begin() as conn:
+                await conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} {_bounds_clause(month)}"))
+            await _bump_recycles(engine)
+            raise
+        partial.rename(path)
+
+        if not keep_detached:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP TABLE {name}"))
+        archived.append(f"{name} -> {path}")
+    return archived
+
+
+async def main(args):
+    engine = build_engine(poolclass=NullPool, name="maintenance", statement_timeout_ms=0)
+    try:
+        if args.command == "ensure":
+            async with engine.begin() as conn:
+                done, moved = await ensure_partitions(conn, args.months_ahead)
+            if moved:
+                await _bump_recycles(engine)
+        else:
+            done = await archive_partitions(engine, args.older_than, Path(args.dir), args.format, args.keep_detached)
+        for line in done:
+            print(line)
+        print(f"{args.command}: {len(done)} partition(s)")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure = commands.add_parser("ensure", help="Create upcoming monthly partitions")
+    ensure.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    archive = commands.add_parser("archive", help="Detach, export and drop old partitions")
+    archive.add_argument("--older-than", type=int, default=RETENTION_MONTHS, help="Retention in months")
+    archive.add_argument("--dir", default="archive")
+    archive.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    archive.add_argument("--keep-detached", action="store_true", help="Keep the detached table after exporting")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+"""
+Backfill for compressed report payloads.
+
+`compress` rewrites plain payloads above the compression threshold into
+reports.data_compressed, in id order and one committed batch at a time, so it can
+run against a live database and be resumed after an interruption. Each batch
+locks its rows while it converts them. `decompress` turns every compressed payload
+back into text, e.g. before downgrading:
+
+    python -m app.maintenance.reports compress --batch-size 200
+    python -m app.maintenance.reports decompress
+
+The table keeps its old size until it is vacuumed (VACUUM FULL, or pg_repack on a
+busy database); plain VACUUM only makes the freed space reusable.
+"""
+import argparse
+import asyncio
+from typing import Optional
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import build_engine
+from app.models.report import Report
+from app.services.report import decompress_payload, encode_payload
+
+BATCH_SIZE = 200
+
+table = Report.__table__
+
+
+async def compress_reports(engine: AsyncEngine, batch_size: int = BATCH_SIZE, codec: Optional[str] = None,
+                           threshold: Optional[int] = None) -> dict:
+    """Compress plain payloads larger than `threshold` bytes (the configured one by default)."""
+    threshold = settings.report_compression_threshold_bytes if threshold is None else threshold
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"), table.c.data.isnot(None))
+        .values(data=None, data_compressed=bindparam("blob"), data_codec=bindparam("codec"),
+                data_size=bindparam("size"))
+    )
+    totals = {"rows": 0, "compressed": 0, "bytes_before": 0, "bytes_after": 0}
+    after = None
+    while True:
+        async with engine.begin() as conn:
+            query = select(table.c.id, table.c.data).where(
+                table.c.data.isnot(None), func.octet_length(table.c.data) > threshold
+            )
+            if after is not None:
+                query = query.where(table.c.id > after)
+            # Locked until the batch commits, so the API cannot write a new payload between
+            # this read and the update, which would then replace it with the old one
+            rows = (await conn.execute(
+                query.order_by(table.c.id).limit(batch_size).with_for_update(key_share=True)
+            )).all()
+            if not rows:
+                return totals
+            after = rows[-1].id
+
+            params = []
+            for row in rows:
+                values = encode_payload(row.data, codec, threshold)
+                if values["data_codec"] is None:
+                    continue  # Would not shrink
+                params.append({"row_id": row.id, "blob": values["data_compressed"], "codec": values["data_codec"],
+                               "size": values["data_size"]})
+                totals["bytes_before"] += values["data_size"]
+                totals["bytes_after"] += len(values["data_compressed"])
+            if params:
+                await conn.execute(stmt, params)
+            totals["rows"] += len(rows)
+            totals["compressed"] += len(params)
+
+
+async def decompress_reports(engine: AsyncEngine, batch_size: int = BATCH_SIZE) -> dict:
+    """Store every compressed payload as plain text again."""
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"), table.c.data_codec.isnot(None))
+        .values(data=bindparam("text"), data_compressed=None, data_codec=None, data_size=None)
+    )
+    totals = {"rows": 0}
+    after = None
+    while True:
+        async with engine.begin() as conn:
+            query = select(table.c.id, table.c.data_compressed, table.c.data_codec).where(table.c.data_codec.isnot(None))
+            if after is not None:
+                query = query.where(table.c.id > after)
+            rows = (await conn.execute(
+                query.order_by(table.c.id).limit(batch_size).with_for_update(key_share=True)
+            )).all()
+            if not rows:
+                return totals
+            after = rows[-1].id
+            await conn.execute(stmt, [
+                {"row_id": row.id, "text": decompress_payload(row.data_compressed, row.data_codec).decode()}
+                for row in rows
+            ])
+            totals["rows"] += len(rows)
+
+
+async def main(args):
+    engine = build_engine(poolclass=NullPool, name="maintenance", statement_timeout_ms=0)
+    try:
+        if args.command == "compress":
+            totals = await compress_reports(engine, args.batch_size, args.codec, args.threshold)
+            ratio = totals["bytes_before"] / totals["bytes_after"] if totals["bytes_after"] else 0
+            print(f"compress: {totals['compressed']} of {totals['rows']} candidate report(s), "
+                  f"{totals['bytes_before'] / 1024 / 1024:.1f} MB -> {totals['bytes_after'] / 1024 / 1024:.1f} MB "
+                  f"({ratio:.1f}x)")
+        else:
+            totals = await decompress_reports(engine, args.batch_size)
+            print(f"decompress: {totals['rows']} report(s)")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    compress = commands.add_parser("compress", help="Compress existing plain payloads above the threshold")
+    compress.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    compress.add_argument("--codec", choices=["zlib", "zstd"], help="Default: WMS_REPORT_COMPRESSION_CODEC")
+    compress.add_argument("--threshold", type=int, help="Bytes; default: WMS_REPORT_COMPRESSION_THRESHOLD_BYTES")
+    decompress = commands.add_parser("decompress", help="Store every compressed payload as text again")
+    decompress.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,44 @@
+"""
+Upkeep of schedules.next_run_at.
+
+`advance` moves every next run that has passed on to the schedule's next occurrence,
+one committed batch at a time. Run it every few minutes (e.g. from cron);
+/schedules/upcoming works out schedules overdue by up to WMS_SCHEDULE_ADVANCE_MAX_LAG_S
+itself until then, leaves older ones out and reports the lag as
+wms_schedule_advance_lag_seconds. `--missing` also fills in schedules that have
+no next run yet, e.g. right after upgrading:
+
+    python -m app.maintenance.schedules advance
+    python -m app.maintenance.schedules advance --missing
+"""
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.database import build_engine
+from app.services.schedule import advance_due_schedules
+
+BATCH_SIZE = 1000
+
+
+async def main(args):
+    engine = build_engine(poolclass=NullPool, name="maintenance", statement_timeout_ms=0)
+    try:
+        async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as db:
+            count = await advance_due_schedules(db, datetime.now(timezone.utc), args.batch_size, args.missing)
+        print(f"advance: {count} schedule(s)")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    advance = commands.add_parser("advance", help="Move passed next runs on to the next occurrence")
+    advance.add_argument("--missing", action="store_true", help="Also fill in schedules without a next run")
+    advance.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,144 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.services.schedule_cache import cache_stats
+
+REQUEST_LATENCY = Histogram(
+    "wms_http_request_duration_seconds", "HTTP request latency by route", ["method", "route"]
+)
+REQUESTS_IN_FLIGHT = Gauge("wms_http_requests_in_flight", "HTTP requests currently being served")
+RESPONSES = Counter("wms_http_responses_total", "HTTP responses by route and status code", ["method", "route", "status"])
+
+QUERY_LATENCY = Histogram(
+    "wms_db_query_duration_seconds", "SQL statement execution time by statement type", ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+QUERIES_PER_REQUEST = Histogram(
+    "wms_db_queries_per_request", "SQL statements executed per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 32, 64),
+)
+
+POOL_CHECKED_OUT = Gauge("wms_db_pool_checked_out", "Connections currently checked out of the pool", ["engine"])
+POOL_OVERFLOW = Gauge("wms_db_pool_overflow", "Connections open beyond pool_size", ["engine"])
+POOL_ACQUIRE = Histogram(
+    "wms_db_pool_acquire_seconds", "Time spent waiting for a pooled connection, including connects", ["engine"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+READ_ROUTING = Counter("wms_db_read_routing", "Read sessions by target database and reason", ["target", "reason"])
+REPLICA_LAG = Gauge("wms_db_replica_lag_seconds", "Last measured replication lag of the read replica")
+
+INGEST_DEPTH = Gauge("wms_recycle_ingest_queue_depth", "Recycle logs accepted but not yet written")
+SCHEDULE_ADVANCE_LAG = Gauge(
+    "wms_schedule_advance_lag_seconds", "Age of the oldest passed schedule next run, as seen by /schedules/upcoming"
+)
+
+# Statement counter of the request being served; None outside of HTTP requests
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """The default async queue pool, timing how long each checkout waits for a connection."""
+
+    metrics_name = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_ACQUIRE.labels(self.metrics_name).observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine: AsyncEngine, name: str = "primary"):
+    """Attach statement timing hooks and pool gauges to an engine, labelled with `name`."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        QUERY_LATENCY.labels(statement.lstrip().split(None, 1)[0].upper()).observe(elapsed)
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+
+    pool = sync_engine.pool
+    if isinstance(pool, InstrumentedPool):
+        pool.metrics_name = name
+        POOL_CHECKED_OUT.labels(name).set_function(pool.checkedout)
+        POOL_OVERFLOW.labels(name).set_function(lambda: max(pool.overflow(), 0))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, in-flight requests, status codes and queries per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        queries = [0]
+        token = _request_queries.set(queries)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec()
+            _request_queries.reset(token)
+
+            # Label by route template rather than raw path to keep cardinality bounded
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], route_path).observe(elapsed)
+            RESPONSES.labels(scope["method"], route_path, str(status_code)).inc()
+            QUERIES_PER_REQUEST.labels(route_path).observe(queries[0])
+
+
+class ScheduleCacheCollector:
+    """Exposes the schedule id cache counters at scrape time."""
+
+    def collect(self):
+        stats = cache_stats()
+        lookups = CounterMetricFamily("wms_schedule_cache_lookups", "Schedule id cache lookups by outcome",
+                                      labels=["outcome"])
+        for outcome in ("hits", "negative_hits", "misses"):
+            lookups.add_metric([outcome], stats[outcome])
+        yield lookups
+        yield CounterMetricFamily("wms_schedule_cache_invalidations", "Schedule id cache invalidations",
+                                  value=stats["invalidations"])
+        size = GaugeMetricFamily("wms_schedule_cache_entries", "Schedule id cache entries", labels=["kind"])
+        size.add_metric(["known"], stats["known_size"])
+        size.add_metric(["missing"], stats["missing_size"])
+        yield size
+
+
+REGISTRY.register(ScheduleCacheCollector())
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
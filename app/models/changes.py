@@ -0,0 +1,28 @@
+from sqlalchemy import BigInteger, Column, DateTime, String, func
+from .schedule import Base
+from sqlalchemy.dialects.postgresql import UUID
+
+# Position columns kept out of API payloads; the feed hands them out as opaque tokens
+CHANGE_COLUMNS = ("change_xid", "change_seq")
+
+class ChangeTombstone(Base):
+    """One row per deleted recycle log or schedule, written by the record_tombstones trigger."""
+    __tablename__ = "change_tombstones"
+
+    resource = Column(String(32), primary_key=True)  # "recycles" or "schedules"
+    change_xid = Column(BigInteger, primary_key=True)  # Primary key order is the feed order
+    change_seq = Column(BigInteger, primary_key=True)
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return f"<ChangeTombstone(resource={self.resource}, id={self.id}, deleted_at={self.deleted_at})>"
+
+class ChangeFeedHorizon(Base):
+    """Feed position up to which tombstones have been pruned; older tokens can no longer be served."""
+    __tablename__ = "change_feed_horizons"
+
+    resource = Column(String(32), primary_key=True)
+    change_xid = Column(BigInteger, nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    id = Column(UUID(as_uuid=True), nullable=False)
@@ -1,17 +1,40 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, String, Float, DateTime, FetchedValue, ForeignKey, Index, SmallInteger, func, select
+from sqlalchemy.orm import column_property, relationship
 from .schedule import Base
-import uuid
+from .ids import uuid7
 from sqlalchemy.dialects.postgresql import UUID
 
+class RecycleType(Base):
+    """Distinct Recycle.type values; rows are only ever added, so ids map to the same name forever."""
+    __tablename__ = "recycle_types"
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, unique=True)
+
 class Recycle(Base):
     __tablename__ = "recycle"
+    __table_args__ = (
+        Index("ix_recycle_date_id", "date", "id"),  # Keyset pagination order
+        Index("ix_recycle_schedule_id_date", "schedule_id", "date"),  # Filtered list queries
+        Index("ix_recycle_type_id_date", "type_id", "date"),
+        Index("ix_recycle_change_position", "change_xid", "change_seq", "id"),  # Changes feed order
+        # Monthly range partitions on date, managed by app.maintenance.partitions
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    type = Column(String, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # Time-ordered UUIDv7
+    type_id = Column(SmallInteger, ForeignKey('recycle_types.id'), nullable=False)
     quantity = Column(Float, nullable=False)
-    date = Column(DateTime(timezone=True), nullable=False)  # Timezone-aware DateTime
+    date = Column(DateTime(timezone=True), primary_key=True, nullable=False)  # Partition key, so part of the primary key
     schedule_id = Column(UUID(as_uuid=True), ForeignKey('schedules.id'), nullable=False)  # Foreign Key
+    created_at = Column(DateTime(timezone=True), nullable=True, server_default=func.now())  # Null for rows older than the column
+    # Maintained by the track_change trigger on every insert and update; see app.services.changes
+    updated_at = Column(DateTime(timezone=True), nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    change_xid = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    change_seq = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+
+    # Name resolved in SQL for reads; writes and aggregates map ids with app.services.lookups
+    type = column_property(select(RecycleType.name).where(RecycleType.id == type_id).scalar_subquery())
 
     schedule = relationship("Schedule", back_populates="recycles")  # This creates a relationship back to Schedule
 
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Float, Date, Integer, Index, SmallInteger
+from .schedule import Base
+from sqlalchemy.dialects.postgresql import UUID
+
+class RecycleDailyRollup(Base):
+    """Per-day totals of recycle logs, kept in step with the recycle table by the recycle services."""
+    __tablename__ = "recycle_daily_rollup"
+    __table_args__ = (
+        Index("ix_recycle_daily_rollup_schedule_id", "schedule_id"),  # Per-schedule totals
+    )
+
+    day = Column(Date, primary_key=True)  # UTC calendar day of Recycle.date
+    type_id = Column(SmallInteger, primary_key=True)  # recycle_types.id
+    schedule_id = Column(UUID(as_uuid=True), primary_key=True)
+    total_quantity = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<RecycleDailyRollup(day={self.day}, type_id={self.type_id}, total_quantity={self.total_quantity})>"
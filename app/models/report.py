@@ -1,15 +1,32 @@
-from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy import CheckConstraint, Column, String, DateTime, Integer, LargeBinary, Text, Index
+from sqlalchemy.orm import deferred
 from .schedule import Base
-import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from .ids import uuid7
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+
+# Text search configuration used to build and query Report.search_vector
+SEARCH_CONFIG = "english"
 
 class Report(Base):
     __tablename__ = "reports"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # Time-ordered UUIDv7
     type = Column(String, nullable=False)
     time = Column(DateTime(timezone=True), nullable=False)  # Timezone-aware DateTime
-    data = Column(Text, nullable=False)
+    # The payload is either plain text in `data` or, above the compression threshold,
+    # codec-compressed UTF-8 in `data_compressed`; see app/services/report.py
+    data = Column(Text, nullable=True)
+    data_compressed = deferred(Column(LargeBinary, nullable=True))
+    data_codec = Column(String(8), nullable=True)  # "zlib" or "zstd"; NULL for plain rows
+    data_size = Column(Integer, nullable=True)  # Uncompressed bytes of compressed rows
+    # Written by the report service, since Postgres cannot read compressed payloads; type
+    # matches rank above words in the payload. Deferred so loading a Report never ships it
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
+
+    __table_args__ = (
+        CheckConstraint("(data IS NULL) <> (data_compressed IS NULL)", name="ck_reports_payload"),
+        Index("ix_reports_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     def __repr__(self):
         return f"<Report(id={self.id}, type={self.type}, time={self.time})>"
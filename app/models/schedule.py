@@ -1,20 +1,51 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import BigInteger, Column, String, DateTime, FetchedValue, ForeignKey, Index, SmallInteger, func, select
 from sqlalchemy.ext.declarative import declarative_base
 import pytz
-import uuid
+from .ids import uuid7
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 
 Base = declarative_base()
 
+class ScheduleDay(Base):
+    """Distinct Schedule.day values; rows are only ever added, so ids map to the same name forever."""
+    __tablename__ = "schedule_days"
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, unique=True)
+
+class ScheduleFrequency(Base):
+    """Distinct Schedule.frequency values, append-only like ScheduleDay."""
+    __tablename__ = "schedule_frequencies"
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, unique=True)
+
 class Schedule(Base):
     __tablename__ = "schedules"
+    __table_args__ = (
+        Index("ix_schedules_time_id", "time", "id"),  # Keyset pagination order
+        Index("ix_schedules_next_run_at", "next_run_at"),  # Upcoming pickups by due time
+        Index("ix_schedules_change_position", "change_xid", "change_seq", "id"),  # Changes feed order
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    day = Column(String, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # Time-ordered UUIDv7
+    day_id = Column(SmallInteger, ForeignKey('schedule_days.id'), nullable=False)
     time = Column(DateTime(timezone=True), nullable=False)  # Timezone-aware DateTime
-    frequency = Column(String, nullable=False)
+    frequency_id = Column(SmallInteger, ForeignKey('schedule_frequencies.id'), nullable=False)
+    next_run_at = Column(DateTime(timezone=True), nullable=True)  # Derived from day/frequency/time
+    created_at = Column(DateTime(timezone=True), nullable=True, server_default=func.now())  # Null for rows older than the column
+    # Maintained by the track_change trigger on every insert and update; see app.services.changes
+    updated_at = Column(DateTime(timezone=True), nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    change_xid = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    change_seq = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+
+    # Names resolved in SQL for reads; writes and recurrence math map ids with app.services.lookups
+    day = column_property(select(ScheduleDay.name).where(ScheduleDay.id == day_id).scalar_subquery())
+    frequency = column_property(
+        select(ScheduleFrequency.name).where(ScheduleFrequency.id == frequency_id).scalar_subquery()
+    )
 
     recycles = relationship("Recycle", back_populates="schedule")  # Relationship to Recycle model
 
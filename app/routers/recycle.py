@@ -1,29 +1,111 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException,status,Query
-from sqlalchemy import select,func
+from datetime import date
+from functools import partial
+from typing import List, Literal, Optional
+import json
+from fastapi import APIRouter, Depends, HTTPException,status,Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.recycle import Recycle
-from app.services.recycle import create_recycle, get_recycles, get_recycle, update_recycle, delete_recycle,get_paginated_recycles
-from app.schemas.recycle import RecycleCreate, RecycleUpdate, RecycleOut
-from app.database import get_db
+from app.services.recycle import create_recycle, get_recycles, get_recycle, update_recycle, delete_recycle,get_paginated_recycles, stream_recycles, bulk_create_recycles, recycle_filter_clauses, recycles_payload, RECYCLE_COLUMNS, RECYCLE_NAMES
+from app.services.export import export_response
+from app.services.serialization import json_response
+from app.services.rollup import get_recycle_stats
+from app.services.pagination import encode_cursor, decode_cursor, count_rows
+from app.schemas.recycle import RecycleCreate, RecycleUpdate, RecycleOut, RecycleBulkResult, RecycleStat, RecycleFilters, RecycleAccepted, RecycleAnalyticsGroup
+from app.services.recycle_analytics import recycle_analytics
+from app.services.ingest import ingest_buffer
+from app.services.schedule_cache import schedule_exists
+from app.config import settings
+from app.schemas.batch import BatchGetRequest, BatchGetResult
+from app.services.batch import batch_get
+from app.schemas.changes import ChangePage, CHANGES_DEFAULT_LIMIT, CHANGES_MAX_LIMIT
+from app.services.changes import get_changes
+from app.database import get_db, get_read_db
 from uuid import UUID
 
 router = APIRouter()
 
-@router.post("/", response_model=RecycleOut)
+# Upper bound on rows accepted by a single bulk upload
+BULK_MAX_ROWS = 10000
+
+# Date ranges are half-open everywhere: from <= date < to
+FROM_DESCRIPTION = "Inclusive lower bound on the day"
+TO_DESCRIPTION = "Exclusive upper bound on the day: to=2026-02-01 covers January"
+
+@router.post("/", response_model=RecycleOut, responses={202: {"model": RecycleAccepted}})
 async def create_recycle_endpoint(recycle: RecycleCreate, db: AsyncSession = Depends(get_db)):
     try:
+        if settings.recycle_ingest_buffered:
+            # Write-behind: validate now, answer 202 with the id, let the buffer batch the INSERT
+            if not await schedule_exists(db, recycle.schedule_id):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid schedule_id, schedule not found")
+            recycle_id = await ingest_buffer.enqueue(recycle)
+            return json_response(RecycleAccepted(id=recycle_id), status_code=status.HTTP_202_ACCEPTED)
         return await create_recycle(db, recycle)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
+
+
+
+@router.post("/batch-get", response_model=BatchGetResult[RecycleOut])
+async def batch_get_recycles_endpoint(batch: BatchGetRequest, db: AsyncSession = Depends(get_read_db)):
+    try:
+        # One query for all ids; results come back in request order with not-found markers
+        return json_response(await batch_get(db, Recycle, batch.ids, RECYCLE_COLUMNS, RECYCLE_NAMES))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
+
+
+
+@router.post("/bulk", response_model=RecycleBulkResult)
+async def bulk_create_recycles_endpoint(request: Request, db: AsyncSession = Depends(get_db)):
+    """Accepts a JSON array of recycle logs, or one log per line with Content-Type application/x-ndjson."""
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                # Keep the row's position so the error report lines up with the upload
+                items.append(None)
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array")
+
+    if len(items) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"At most {BULK_MAX_ROWS} rows per request")
+    try:
+        return await bulk_create_recycles(db, items)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
 
 
 
 @router.get("/", response_model=List[RecycleOut])
-async def read_recycles(db: AsyncSession = Depends(get_db)):
+async def read_recycles(request: Request, filters: RecycleFilters = Depends(),
+                        format: Literal["json", "ndjson", "csv"] = "json", db: AsyncSession = Depends(get_read_db)):
     try:
-        recycles = await get_recycles(db)
-        return recycles
+        # ndjson/csv stream rows from a server-side cursor instead of building the full list
+        if format != "json":
+            return export_response(partial(stream_recycles, filters=filters), format,
+                                   request.state.read_sessionmaker)
+        recycles = await get_recycles(db, filters)
+        return json_response(await recycles_payload(db, recycles))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
 
@@ -31,24 +113,112 @@ async def read_recycles(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/all", response_model=dict)
-async def read_paginated_recycles(skip: int = 0, limit: int = 50,db:AsyncSession = Depends(get_db)) -> dict:
+async def read_paginated_recycles(filters: RecycleFilters = Depends(), skip: int = 0, limit: int = 50,
+                                  cursor: Optional[str] = None, exact_total: bool = False,
+                                  db: AsyncSession = Depends(get_read_db)) -> dict:
+    try:
+        after = decode_cursor(cursor) if cursor else None
+        recycles = await get_paginated_recycles(db, skip=skip, limit=limit, after=after, filters=filters)
+        total_items = await count_rows(db, Recycle, exact=exact_total, where=recycle_filter_clauses(filters))
+        next_cursor = encode_cursor(recycles[-1].date, recycles[-1].id) if recycles and len(recycles) == limit else None
+        return json_response({"recycles": await recycles_payload(db, recycles), "total": total_items,
+                              "total_is_estimate": not exact_total, "next_cursor": next_cursor})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
+
+
+
+@router.get("/ingest/status", response_model=dict)
+async def read_ingest_status():
+    # Depth and counters of the write-behind buffer in this process
+    return ingest_buffer.stats()
+
+
+
+@router.get("/stats", response_model=List[RecycleStat])
+async def read_recycle_stats(group_by: Literal["type", "schedule", "day"] = "type",
+                             date_from: Optional[date] = Query(None, alias="from", description=FROM_DESCRIPTION),
+                             date_to: Optional[date] = Query(None, alias="to", description=TO_DESCRIPTION),
+                             db: AsyncSession = Depends(get_read_db)):
+    try:
+        # Totals come from the daily rollup table, not from the raw recycle rows
+        return await get_recycle_stats(db, group_by, date_from, date_to)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
+
+
+
+@router.get("/analytics", response_model=List[RecycleAnalyticsGroup])
+async def read_recycle_analytics(group_by: List[Literal["type", "schedule", "day", "week", "month"]] = Query(["type"]),
+                                 date_from: Optional[date] = Query(None, alias="from", description=FROM_DESCRIPTION),
+                                 date_to: Optional[date] = Query(None, alias="to", description=TO_DESCRIPTION),
+                                 type: Optional[str] = None, schedule_id: Optional[UUID] = None,
+                                 order: Literal["key", "total"] = "key",
+                                 limit: Optional[int] = Query(None, ge=1, le=100000)):
+    try:
+        if len(set(group_by)) != len(group_by) or len(group_by) > 3:
+            raise HTTPException(status_code=422, detail="group_by takes up to 3 distinct dimensions")
+        # Vectorized group-by over the in-memory columnar snapshot; no query unless it needs a refresh
+        await recycle_analytics.ensure_fresh()
+        return json_response(recycle_analytics.aggregate(group_by, date_from, date_to, type, schedule_id, order, limit))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
+
+
+
+@router.get("/analytics/top-schedules", response_model=List[RecycleAnalyticsGroup])
+async def read_top_schedules(limit: int = Query(10, ge=1, le=1000),
+                             date_from: Optional[date] = Query(None, alias="from", description=FROM_DESCRIPTION),
+                             date_to: Optional[date] = Query(None, alias="to", description=TO_DESCRIPTION),
+                             type: Optional[str] = None):
+    try:
+        # Schedules by total quantity, largest first
+        await recycle_analytics.ensure_fresh()
+        return json_response(recycle_analytics.aggregate(["schedule"], date_from, date_to, type,
+                                                         order="total", limit=limit))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
+
+
+
+@router.get("/analytics/status", response_model=dict)
+async def read_recycle_analytics_status():
+    # Size, memory footprint and freshness of the columnar snapshot in this process
+    return recycle_analytics.stats()
+
+
+
+@router.get("/changes", response_model=ChangePage[RecycleOut])
+async def read_recycle_changes(since: Optional[str] = None,
+                               limit: int = Query(CHANGES_DEFAULT_LIMIT, ge=1, le=CHANGES_MAX_LIMIT),
+                               db: AsyncSession = Depends(get_read_db)):
     try:
-        total_query = await db.execute(select(func.count(Recycle.id)))
-        total_items = total_query.scalar_one()
-        recycles = await get_paginated_recycles(db,skip=skip,limit=limit)
-        return {"recycles": recycles, "total": total_items}
+        # Logs inserted, updated or deleted after the token, for incremental client sync
+        return json_response(await get_changes(db, "recycles", Recycle, RECYCLE_COLUMNS, since, limit, RECYCLE_NAMES))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
 
 
 
 @router.get("/{recycle_id}", response_model=RecycleOut)
-async def read_recycle(recycle_id: UUID, db: AsyncSession = Depends(get_db)):
+async def read_recycle(recycle_id: UUID, db: AsyncSession = Depends(get_read_db)):
     try:
         db_recycle = await get_recycle(db, recycle_id)
         if db_recycle is None:
             raise HTTPException(status_code=404, detail="Recycling log not found")
         return db_recycle
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
 
@@ -61,6 +231,8 @@ async def update_recycle_endpoint(recycle_id: UUID, recycle_update: RecycleUpdat
         if db_recycle is None:
             raise HTTPException(status_code=404, detail="Recycling log not found")
         return db_recycle
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
 
@@ -73,5 +245,7 @@ async def delete_recycle_endpoint(recycle_id: UUID, db: AsyncSession = Depends(g
         if db_recycle is None:
             raise HTTPException(status_code=404, detail="Recycling log not found")
         return db_recycle
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
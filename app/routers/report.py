@@ -1,26 +1,104 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from pydantic_core import to_json
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.services.report import create_report, get_reports, get_report, update_report, delete_report
-from app.schemas.report import ReportCreate, ReportUpdate, ReportOut
-from app.database import get_db
+from app.services.report import create_report, get_reports, get_report_row, get_report_data, report_columns, search_reports, update_report, delete_report, decode_report, report_payload, reports_payload, REPORT_COLUMNS, REPORT_FIELDS, REPORT_SUMMARY_FIELDS
+from app.schemas.report import ReportCreate, ReportUpdate, ReportOut, ReportSearchPage
+from app.services.pagination import encode_cursor, decode_cursor
+from app.services.response_cache import cached_response
+from app.services.serialization import json_response
+from app.services.batch import batch_get
+from app.schemas.batch import BatchGetRequest, BatchGetResult
+from app.models.report import Report
+from app.database import get_db, get_read_db
 from uuid import UUID
 
 router = APIRouter()
 
+FIELDS_DESCRIPTION = f"Comma-separated subset of {', '.join(REPORT_FIELDS)}; id is always returned"
+
+def _report_fields(fields: Optional[str], view: str) -> Optional[list[str]]:
+    # view=summary never reads the payload, only its size
+    if view == "summary":
+        return list(REPORT_SUMMARY_FIELDS)
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    try:
+        report_columns(names)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return names
+
 @router.post("/", response_model=ReportOut)
 async def create_report_endpoint(report: ReportCreate, db: AsyncSession = Depends(get_db)):
     return await create_report(db, report)
 
+@router.post("/batch-get", response_model=BatchGetResult[ReportOut])
+async def batch_get_reports_endpoint(batch: BatchGetRequest, db: AsyncSession = Depends(get_read_db)):
+    # One query for all ids; results come back in request order with not-found markers
+    batch_result = await batch_get(db, Report, batch.ids, REPORT_COLUMNS)
+    for result in batch_result["results"]:
+        if result["item"] is not None:
+            decode_report(result["item"])
+    return json_response(batch_result)
+
 @router.get("/", response_model=list[ReportOut])
-async def read_reports(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    return await get_reports(db, skip, limit)
+async def read_reports(request: Request, skip: int = 0, limit: int = 100,
+                       fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+                       view: Literal["full", "summary"] = "full", db: AsyncSession = Depends(get_read_db)):
+    columns = _report_fields(fields, view)
+
+    async def render():
+        reports = await get_reports(db, skip, limit, columns)
+        return to_json(reports_payload(reports))
+
+    # Answered from the ETag or the rendered-body cache while no report has changed
+    return await cached_response(request, ["reports"], render)
+
+@router.get("/search", response_model=ReportSearchPage)
+async def search_reports_endpoint(request: Request, q: str = Query(..., min_length=1, max_length=256),
+                                  limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None,
+                                  db: AsyncSession = Depends(get_read_db)):
+    # Web-search syntax: words, "quoted phrases", OR and -excluded words
+    after = decode_cursor(cursor, float) if cursor else None
+
+    async def render():
+        hits = await search_reports(db, q, limit, after)
+        next_cursor = encode_cursor(hits[-1]["rank"], hits[-1]["id"]) if len(hits) == limit else None
+        return to_json({"results": hits, "next_cursor": next_cursor})
+
+    return await cached_response(request, ["reports"], render)
 
 @router.get("/{report_id}", response_model=ReportOut)
-async def read_report(report_id: UUID, db: AsyncSession = Depends(get_db)):
-    db_report = await get_report(db, report_id)
-    if db_report is None:
+async def read_report(request: Request, report_id: UUID,
+                      fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+                      view: Literal["full", "summary"] = "full", db: AsyncSession = Depends(get_read_db)):
+    columns = _report_fields(fields, view)
+
+    async def render():
+        db_report = await get_report_row(db, report_id, columns)
+        if db_report is None:
+            raise HTTPException(status_code=404, detail="Report not found")
+        return to_json(report_payload(db_report))
+
+    return await cached_response(request, ["reports"], render)
+
+@router.get("/{report_id}/data", response_class=Response,
+            responses={200: {"content": {"text/plain": {}}}, 206: {"description": "Partial content"}})
+async def read_report_data(report_id: UUID, range_header: Optional[str] = Header(None, alias="Range"),
+                           db: AsyncSession = Depends(get_read_db)):
+    # The raw payload; a single `Range: bytes=first-last` fetches one slice of it
+    result = await get_report_data(db, report_id, range_header)
+    if result is None:
         raise HTTPException(status_code=404, detail="Report not found")
-    return db_report
+    content, bounds, size = result
+    headers = {"Accept-Ranges": "bytes"}
+    if bounds is None:
+        return Response(content=content, media_type="text/plain; charset=utf-8", headers=headers)
+    headers["Content-Range"] = f"bytes {bounds[0]}-{bounds[1]}/{size}"
+    return Response(content=content, status_code=status.HTTP_206_PARTIAL_CONTENT,
+                    media_type="text/plain; charset=utf-8", headers=headers)
 
 @router.put("/{report_id}", response_model=ReportOut)
 async def update_report_endpoint(report_id: UUID, report_update: ReportUpdate, db: AsyncSession = Depends(get_db)):
@@ -1,58 +1,169 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic_core import to_json
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.services.schedule import create_schedule, get_schedule, update_schedule, delete_schedule, get_all_schedules,get_paginated_schedules
-from app.schemas.schedule import ScheduleCreate, ScheduleUpdate, ScheduleOut
-from app.database import get_db
-from sqlalchemy import select, func
+from app.services.schedule import create_schedule, update_schedule, delete_schedule, get_all_schedules,get_paginated_schedules, stream_schedules, get_upcoming_schedules, get_schedule_occurrences, get_schedule_detail, schedules_payload, ScheduleInclude, SCHEDULE_COLUMNS, SCHEDULE_NAMES
+from app.services.export import export_response
+from app.services.serialization import json_response
+from app.services.schedule_cache import cache_stats
+from app.services.response_cache import cached_response
+from app.schemas.schedule import ScheduleCreate, ScheduleUpdate, ScheduleOut, ScheduleDetailOut, ScheduleOccurrence
+from app.services.pagination import encode_cursor, decode_cursor, count_rows
+from app.schemas.batch import BatchGetRequest, BatchGetResult
+from app.services.batch import batch_get
+from app.schemas.changes import ChangePage, CHANGES_DEFAULT_LIMIT, CHANGES_MAX_LIMIT
+from app.services.changes import get_changes
+from app.database import get_db, get_read_db
 from uuid import UUID
 from app.models.schedule import Schedule
 
 router = APIRouter()
 
+MAX_UPCOMING_WINDOW = timedelta(days=31)
+MAX_OCCURRENCE_RANGE = timedelta(days=366)
+
+
+def _include_resources(include: List[ScheduleInclude]) -> list[str]:
+    # Included recycles and totals go stale on recycle writes too
+    return ["schedules", "recycles"] if include else ["schedules"]
+
 @router.post("/", response_model=ScheduleOut)
 async def create_schedule_endpoint(schedule: ScheduleCreate, db: AsyncSession = Depends(get_db)):
     try:
         return await create_schedule(db, schedule)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+
+@router.post("/batch-get", response_model=BatchGetResult[ScheduleOut])
+async def batch_get_schedules_endpoint(batch: BatchGetRequest, db: AsyncSession = Depends(get_read_db)):
+    try:
+        # One query for all ids; results come back in request order with not-found markers
+        return json_response(await batch_get(db, Schedule, batch.ids, SCHEDULE_COLUMNS, SCHEDULE_NAMES))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 
-@router.get("/", response_model=List[ScheduleOut])
-async def read_schedules(db: AsyncSession = Depends(get_db)):
+@router.get("/", response_model=List[ScheduleDetailOut])
+async def read_schedules(request: Request, format: Literal["json", "ndjson", "csv"] = "json",
+                         include: List[ScheduleInclude] = Query([]), db: AsyncSession = Depends(get_read_db)):
     try:
-        # Fetching schedules through service
-        schedules = await get_all_schedules(db)
-        return schedules
+        # ndjson/csv stream rows from a server-side cursor instead of building the full list
+        if format != "json":
+            return export_response(stream_schedules, format, request.state.read_sessionmaker)
+
+        async def render():
+            # Fetching schedules through service
+            schedules = await get_all_schedules(db, include)
+            return to_json(await schedules_payload(db, schedules, include))
+
+        return await cached_response(request, _include_resources(include), render)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 
 @router.get("/all", response_model=dict)
-async def read_paginated_schedules(skip: int = 0, limit: int = 50, db: AsyncSession = Depends(get_db)):
+async def read_paginated_schedules(request: Request, skip: int = 0, limit: int = 50, cursor: Optional[str] = None,
+                                   exact_total: bool = False, include: List[ScheduleInclude] = Query([]),
+                                   db: AsyncSession = Depends(get_read_db)):
     try:
-        # Fetch total count of schedules
-        total_query = await db.execute(select(func.count(Schedule.id)))
-        total_items = total_query.scalar_one()
-
-        # Fetch paginated schedules
-        schedules = await get_paginated_schedules(db, skip=skip, limit=limit)
-        
-        return {"schedules": schedules, "total": total_items}
+        # An opaque cursor from a previous page switches from OFFSET to keyset pagination
+        after = decode_cursor(cursor) if cursor else None
+
+        async def render():
+            schedules = await schedules_payload(
+                db, await get_paginated_schedules(db, skip=skip, limit=limit, after=after, include=include), include
+            )
+
+            # The planner estimate is used unless the caller asks for an exact count
+            total_items = await count_rows(db, Schedule, exact=exact_total)
+
+            next_cursor = encode_cursor(schedules[-1]["time"], schedules[-1]["id"]) if schedules and len(schedules) == limit else None
+            return to_json({"schedules": schedules, "total": total_items,
+                            "total_is_estimate": not exact_total, "next_cursor": next_cursor})
+
+        return await cached_response(request, _include_resources(include), render)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 
-@router.get("/{schedule_id}", response_model=ScheduleOut)
-async def read_schedule(schedule_id: UUID, db: AsyncSession = Depends(get_db)):
+@router.get("/cache/stats", response_model=dict)
+async def read_schedule_cache_stats():
+    # Hit/miss counters of the schedule id cache used by recycle writes
+    return cache_stats()
+
+
+
+@router.get("/upcoming", response_model=List[ScheduleOut])
+async def read_upcoming_schedules(window: timedelta = Query(timedelta(hours=24), description="ISO 8601 duration, e.g. PT24H or P7D"),
+                                  limit: int = Query(1000, ge=1, le=10000), db: AsyncSession = Depends(get_read_db)):
     try:
-        db_schedule = await get_schedule(db, schedule_id)
-        if db_schedule is None:
-            raise HTTPException(status_code=404, detail="Schedule not found")
-        return db_schedule
+        if window <= timedelta(0) or window > MAX_UPCOMING_WINDOW:
+            raise HTTPException(status_code=422, detail=f"window must be positive and at most {MAX_UPCOMING_WINDOW}")
+        # Schedules whose next run falls within the window, soonest first
+        schedules = await get_upcoming_schedules(db, window, limit)
+        return json_response(schedules)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+
+@router.get("/occurrences", response_model=List[ScheduleOccurrence])
+async def read_schedule_occurrences(start: datetime, end: datetime, db: AsyncSession = Depends(get_read_db)):
+    try:
+        if end <= start or end - start > MAX_OCCURRENCE_RANGE:
+            raise HTTPException(status_code=422, detail=f"end must be after start and at most {MAX_OCCURRENCE_RANGE} later")
+        # Every occurrence of every schedule in [start, end), expanded in one vectorized pass
+        return json_response(await get_schedule_occurrences(db, start, end))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+
+@router.get("/changes", response_model=ChangePage[ScheduleOut])
+async def read_schedule_changes(since: Optional[str] = None,
+                                limit: int = Query(CHANGES_DEFAULT_LIMIT, ge=1, le=CHANGES_MAX_LIMIT),
+                                db: AsyncSession = Depends(get_read_db)):
+    try:
+        # Schedules inserted, updated or deleted after the token, for incremental client sync
+        return json_response(await get_changes(db, "schedules", Schedule, SCHEDULE_COLUMNS, since, limit, SCHEDULE_NAMES))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+
+@router.get("/{schedule_id}", response_model=ScheduleDetailOut)
+async def read_schedule(request: Request, schedule_id: UUID, include: List[ScheduleInclude] = Query([]),
+                        db: AsyncSession = Depends(get_read_db)):
+    try:
+        async def render():
+            db_schedule = await get_schedule_detail(db, schedule_id, include)
+            if db_schedule is None:
+                raise HTTPException(status_code=404, detail="Schedule not found")
+            return to_json(db_schedule)
+
+        return await cached_response(request, _include_resources(include), render)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -65,6 +176,8 @@ async def update_schedule_endpoint(schedule_id: UUID, schedule_update: ScheduleU
         if db_schedule is None:
             raise HTTPException(status_code=404, detail="Schedule not found")
         return db_schedule
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -77,6 +190,8 @@ async def delete_schedule_endpoint(schedule_id: UUID, db: AsyncSession = Depends
         if db_schedule is None:
             raise HTTPException(status_code=404, detail="Schedule not found")
         return db_schedule
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from typing import Generic, List, Optional, TypeVar
+from uuid import UUID
+
+# Upper bound on ids resolved by a single batch-get
+BATCH_GET_MAX_IDS = 1000
+
+T = TypeVar("T")
+
+class BatchGetRequest(BaseModel):
+    ids: List[UUID] = Field(..., max_length=BATCH_GET_MAX_IDS)
+
+class BatchGetItem(BaseModel, Generic[T]):
+    id: UUID
+    found: bool
+    item: Optional[T] = None  # null when no row has this id
+
+class BatchGetResult(BaseModel, Generic[T]):
+    results: List[BatchGetItem[T]]  # One entry per requested id, in request order
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Generic, List, Literal, Optional, TypeVar
+from uuid import UUID
+
+# Changes returned by one /changes request
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 5000
+
+T = TypeVar("T")
+
+class ChangeEntry(BaseModel, Generic[T]):
+    op: Literal["upsert", "delete"]
+    id: UUID
+    item: Optional[T] = None  # Current row for upserts, null for deletes
+    deleted_at: Optional[datetime] = None
+
+class ChangePage(BaseModel, Generic[T]):
+    changes: List[ChangeEntry[T]]  # Oldest first; a row changed several times appears once, at its latest change
+    next: str  # Pass as ?since= to continue after the last change
+    has_more: bool  # More changes are ready now; otherwise poll again later
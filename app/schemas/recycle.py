@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import Any, List, Optional, Union
 from uuid import UUID
 
 class RecycleBase(BaseModel):
@@ -20,6 +20,48 @@ class RecycleUpdate(RecycleBase):
 
 class RecycleOut(RecycleBase):
     id: UUID
+    created_at: Optional[datetime] = None  # Unknown for logs written before it was recorded
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+
+class RecycleAccepted(BaseModel):
+    id: UUID  # Assigned up front; the row is written by the ingest buffer shortly after
+    status: str = "queued"
+
+
+class RecycleBulkCreated(BaseModel):
+    index: int  # Position of the row in the uploaded batch
+    id: UUID
+
+class RecycleBulkError(BaseModel):
+    index: int
+    errors: List[Any]
+
+class RecycleBulkResult(BaseModel):
+    inserted: int
+    created: List[RecycleBulkCreated]
+    errors: List[RecycleBulkError]
+
+class RecycleStat(BaseModel):
+    key: Union[date, UUID, str]  # The type, schedule_id or day, depending on group_by
+    total_quantity: float
+    count: int
+
+class RecycleAnalyticsGroup(BaseModel):
+    # Only the grouped dimensions are present; week is the Monday, month the first day
+    type: Optional[str] = None
+    schedule_id: Optional[UUID] = None
+    day: Optional[date] = None
+    week: Optional[date] = None
+    month: Optional[date] = None
+    count: int
+    total_quantity: float
+
+class RecycleFilters(BaseModel):
+    type: Optional[str] = None
+    schedule_id: Optional[UUID] = None
+    date_from: Optional[datetime] = Field(None, description="Inclusive lower bound on date")
+    date_to: Optional[datetime] = Field(None, description="Exclusive upper bound on date: ranges are half-open, date_from <= date < date_to")
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
 class ReportBase(BaseModel):
@@ -21,3 +21,14 @@ class ReportOut(ReportBase):
 
     class Config:
         from_attributes = True
+
+class ReportSearchHit(BaseModel):
+    id: UUID
+    type: str
+    time: datetime
+    rank: float
+    snippet: str  # Matches wrapped in <mark></mark>
+
+class ReportSearchPage(BaseModel):
+    results: List[ReportSearchHit]
+    next_cursor: Optional[str] = None
@@ -1,7 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from datetime import datetime
 from typing import Optional, List
 from uuid import UUID
+from app.schemas.recycle import RecycleOut
+from app.services.recurrence import parse_recurrence
+
+# Newest logs returned per schedule with ?include=recycles
+SCHEDULE_RECYCLES_LIMIT = 20
 
 class ScheduleBase(BaseModel):
     day: str
@@ -9,7 +14,11 @@ class ScheduleBase(BaseModel):
     frequency: str
 
 class ScheduleCreate(ScheduleBase):
-    pass  # Add fields for creating
+    @model_validator(mode="after")
+    def check_recurrence(self):
+        # Rejects day/frequency pairs the recurrence engine cannot schedule
+        parse_recurrence(self.day, self.frequency)
+        return self
 
 class ScheduleUpdate(ScheduleBase):
     day: Optional[str] = None
@@ -18,6 +27,21 @@ class ScheduleUpdate(ScheduleBase):
 
 class ScheduleOut(ScheduleBase):
     id: UUID
+    next_run_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None  # Unknown for schedules created before it was recorded
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+
+class ScheduleDetailOut(ScheduleOut):
+    # Only present when requested with ?include=
+    recycles: Optional[List[RecycleOut]] = None  # Newest SCHEDULE_RECYCLES_LIMIT logs; page the rest via /recycles/?schedule_id=
+    recycle_count: Optional[int] = None
+    total_quantity: Optional[float] = None
+
+
+class ScheduleOccurrence(BaseModel):
+    schedule_id: UUID
+    at: datetime
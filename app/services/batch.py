@@ -0,0 +1,39 @@
+from typing import Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.services.lookups import NameColumns, decode_names
+
+
+async def batch_get(db: AsyncSession, model, ids: Sequence[UUID], columns: Optional[Sequence] = None,
+                    names: Optional[NameColumns] = None) -> dict:
+    """
+    Resolve many ids of one model with a single `WHERE id = ANY($1)` query.
+
+    The ids travel as one uuid[] parameter, so the statement is the same for any
+    batch size. Results follow the request order, duplicates included, and ids
+    without a row are reported with `found: false`. `columns` narrows the selected
+    columns (all of the table's by default); lookup id columns listed in `names` go
+    out as their names.
+    """
+    table = model.__table__
+    unique_ids = list(dict.fromkeys(ids))
+    rows = {}
+    if unique_ids:
+        ids_param = bindparam("ids", unique_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+        result = await db.execute(select(*(columns or table.c)).where(table.c.id == any_(ids_param)))
+        items = [row._asdict() for row in result]
+        if names:
+            items = await decode_names(db, items, names)
+        rows = {item["id"]: item for item in items}
+
+    return {
+        "results": [
+            {"id": row_id, "found": row_id in rows, "item": rows.get(row_id)}
+            for row_id in ids
+        ]
+    }
@@ -0,0 +1,96 @@
+import base64
+import json
+from typing import Optional, Sequence
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.changes import ChangeFeedHorizon, ChangeTombstone
+from app.services.lookups import NameColumns, decode_names
+
+# Feed positions are (change_xid, change_seq, id). Rows that predate the feed all sit
+# at (0, 0) and are ordered by id; every later write gets a fresh pair from the
+# track_change trigger, and every delete a tombstone from record_tombstones.
+Position = tuple[int, int, UUID]
+FEED_START: Position = (-1, 0, UUID(int=0))
+
+# Every transaction with an xid below the snapshot's xmin has finished, so no change
+# can still appear below it. Serving only those keeps a token from skipping a change
+# whose transaction commits after a later one's. A token also keeps the xmin of the
+# client's first request, its floor: deletes committed before it removed rows the
+# client never saw, so their tombstones are skipped and pruning them does not matter.
+SNAPSHOT_XMIN = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+
+def encode_change_token(position: Position, floor: int) -> str:
+    change_xid, change_seq, row_id = position
+    payload = json.dumps([change_xid, change_seq, str(row_id), floor], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_change_token(token: str) -> tuple[Position, int]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        change_xid, change_seq, row_id, floor = json.loads(base64.urlsafe_b64decode(padded))
+        return (int(change_xid), int(change_seq), UUID(row_id)), int(floor)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid change token")
+
+
+async def get_changes(db: AsyncSession, resource: str, model, columns: Sequence,
+                      since: Optional[str] = None, limit: int = 500, names: Optional[NameColumns] = None) -> dict:
+    """
+    Rows of `model` inserted, updated or deleted after the `since` token, oldest first.
+
+    Upserts come from the (change_xid, change_seq, id) index of the table and deletes
+    from the tombstones of `resource`; each side reads at most `limit + 1` rows of an
+    index range and the two are merged. Without `since` the feed starts from the
+    beginning, which is also how a client does its first full sync; deletes from
+    before that sync are left out.
+    """
+    xmin = (await db.execute(SNAPSHOT_XMIN)).scalar_one()
+    position, floor = decode_change_token(since) if since is not None else (FEED_START, xmin)
+    horizon = (await db.execute(
+        select(ChangeFeedHorizon.change_xid, ChangeFeedHorizon.change_seq, ChangeFeedHorizon.id)
+        .where(ChangeFeedHorizon.resource == resource)
+    )).first()
+    if horizon is not None and position < tuple(horizon) and horizon.change_xid >= floor:
+        raise HTTPException(status_code=status.HTTP_410_GONE,
+                            detail="Deletes after this token have been pruned; sync again without since")
+
+    table = model.__table__
+    upserts = await db.execute(
+        select(*columns, table.c.change_xid, table.c.change_seq)
+        .where(tuple_(table.c.change_xid, table.c.change_seq, table.c.id) > tuple_(*position),
+               table.c.change_xid < xmin)
+        .order_by(table.c.change_xid, table.c.change_seq, table.c.id)
+        .limit(limit + 1)
+    )
+    items = [row._asdict() for row in upserts]
+    positions = [(item.pop("change_xid"), item.pop("change_seq"), item["id"]) for item in items]
+    if names:
+        items = await decode_names(db, items, names)
+    entries = [(key, {"op": "upsert", "id": item["id"], "item": item}) for key, item in zip(positions, items)]
+
+    tombstones = await db.execute(
+        select(ChangeTombstone.change_xid, ChangeTombstone.change_seq, ChangeTombstone.id, ChangeTombstone.deleted_at)
+        .where(ChangeTombstone.resource == resource,
+               tuple_(ChangeTombstone.change_xid, ChangeTombstone.change_seq, ChangeTombstone.id) > tuple_(*position),
+               ChangeTombstone.change_xid >= floor, ChangeTombstone.change_xid < xmin)
+        .order_by(ChangeTombstone.change_xid, ChangeTombstone.change_seq, ChangeTombstone.id)
+        .limit(limit + 1)
+    )
+    for row in tombstones:
+        entries.append(((row.change_xid, row.change_seq, row.id),
+                        {"op": "delete", "id": row.id, "deleted_at": row.deleted_at}))
+
+    entries.sort(key=lambda entry: entry[0])
+    page = entries[:limit]
+    return {
+        "changes": [entry for _, entry in page],
+        "next": encode_change_token(page[-1][0] if page else position, floor),
+        "has_more": len(entries) > limit,
+    }
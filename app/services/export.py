@@ -0,0 +1,75 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Literal, Optional
+
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session
+from app.services.lookups import NameColumns, decode_names
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Rows fetched from the server-side cursor per round trip
+EXPORT_CHUNK_SIZE = 1000
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def stream_rows(db: AsyncSession, query: Select, fmt: ExportFormat, names: Optional[NameColumns] = None,
+                      chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Encode the rows of a Core select as NDJSON or CSV while they are fetched.
+
+    The query runs on a server-side cursor and is consumed one partition at a time,
+    so only `chunk_size` rows are held in memory regardless of the table size.
+    Lookup id columns listed in `names` go out as their names.
+    """
+    result = await db.stream(query.execution_options(yield_per=chunk_size))
+
+    columns = [names[column][0] if names and column in names else column for column in result.keys()]
+    if fmt == "csv":
+        header = io.StringIO()
+        csv.writer(header).writerow(columns)
+        yield header.getvalue().encode()
+
+    async for partition in result.partitions():
+        rows = [row._asdict() for row in partition]
+        if names:
+            rows = await decode_names(db, rows, names)
+        if fmt == "ndjson":
+            yield b"".join(to_json(row) + b"\n" for row in rows)
+        else:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows([_csv_value(value) for value in row.values()] for row in rows)
+            yield buffer.getvalue().encode()
+
+
+def export_response(stream, fmt: ExportFormat, session_factory=async_session) -> StreamingResponse:
+    """
+    Wrap a `stream(db, fmt)` generator in a StreamingResponse.
+
+    The request's session is closed before the body is sent, so the export opens its
+    own session from `session_factory` that lives exactly as long as the stream.
+    """
+    async def body():
+        async with session_factory() as db:
+            async for chunk in stream(db, fmt):
+                yield chunk
+
+    return StreamingResponse(body(), media_type=EXPORT_MEDIA_TYPES[fmt])
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from pydantic_core import to_json
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import settings
+from app.database import async_session
+from app.metrics import INGEST_DEPTH
+from app.models.ids import uuid7
+from app.models.recycle import Recycle
+from app.schemas.recycle import RecycleCreate
+from app.services.lookups import recycle_types
+from app.services.response_cache import bump_version
+from app.services.rollup import RollupDeltas, apply_rollup_deltas
+
+logger = logging.getLogger(__name__)
+
+# Errors caused by the rows themselves; anything else (a dropped connection, a
+# failover, a statement timeout) says nothing about the rows and is retried
+ROW_ERRORS = (IntegrityError, DataError)
+RETRY_DELAY = 0.1  # Seconds before the first retry, doubled up to RETRY_MAX_DELAY
+RETRY_MAX_DELAY = 5.0
+
+
+class RecycleIngestBuffer:
+    """
+    Write-behind buffer for recycle logs.
+
+    Requests put validated logs, with their id already assigned, on a bounded queue
+    and return at once. One background task drains the queue and writes each batch
+    with a multi-row INSERT, its rollup deltas and a single COMMIT, so a burst of
+    requests costs one pooled connection per batch instead of one per request.
+
+    A batch the database cannot take right now is retried with backoff until it can,
+    holding up the queue (and eventually answering 503) rather than losing accepted
+    logs. `stop()` gives the queue `drain_timeout` seconds to be written; whatever is
+    left then, e.g. because the database is down, is saved to an NDJSON file in
+    `spill_dir` for `python -m app.maintenance.ingest replay`. Logs accepted but not
+    yet flushed are lost if the process dies without running `stop()`.
+    """
+
+    def __init__(self, maxsize: int, batch_rows: int, flush_interval: float, enqueue_timeout: float,
+                 drain_timeout: float, spill_dir: str):
+        self.maxsize = maxsize
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.drain_timeout = drain_timeout
+        self.spill_dir = spill_dir
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._deadline: Optional[float] = None  # Loop time at which shutdown stops retrying writes
+        self._putting = 0  # Requests past the _closing check whose put has not finished
+        self._batch: list[dict] = []  # Taken off the queue and not yet written
+        self.counters = {"accepted": 0, "rejected": 0, "flushed": 0, "failed": 0, "retries": 0, "batches": 0,
+                         "spilled": 0}
+        self.last_flush_at: Optional[datetime] = None
+        self.last_batch_rows = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop accepting logs, write what was accepted within drain_timeout and spill the rest."""
+        if self._task is None:
+            return
+        loop = asyncio.get_running_loop()
+        self._closing = True
+        self._deadline = loop.time() + self.drain_timeout
+        # Requests already past the check finish their put within enqueue_timeout
+        while self._putting:
+            await asyncio.sleep(0.01)
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=max(self._deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            logger.error("Recycle ingest buffer not written within %.0fs of shutdown", self.drain_timeout)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # The batch being written when the writer was cancelled may have committed; the
+        # replay skips the logs that are already there
+        leftover = self._batch
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+        self._batch = []
+        if leftover:
+            self._spill(leftover)
+
+    def _spill(self, rows: list[dict]):
+        """Save rows the database did not take before shutdown, one JSON object per line."""
+        name = f"recycle-ingest-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{os.getpid()}.ndjson"
+        path = Path(self.spill_dir) / name
+        try:
+            with open(path, "ab") as spill:
+                spill.write(b"".join(to_json(row) + b"\n" for row in rows))
+        except OSError:
+            # Last resort: the logs themselves go to the log
+            logger.exception("Could not save %d unwritten recycle log(s) to %s: %s", len(rows), path,
+                             to_json(rows).decode())
+            return
+        self.counters["spilled"] += len(rows)
+        logger.error("Saved %d unwritten recycle log(s) to %s; write them with "
+                     "python -m app.maintenance.ingest replay %s", len(rows), path, path)
+
+    async def enqueue(self, recycle: RecycleCreate) -> UUID:
+        """Queue a validated log and return its id; raises 503 while the queue stays full or during shutdown."""
+        if self._closing:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Shutting down")
+        self.start()
+
+        row = {"id": uuid7(), **recycle.model_dump()}
+        self._putting += 1
+        try:
+            # Backpressure: wait briefly for room rather than growing without bound
+            await asyncio.wait_for(self._queue.put(row), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.counters["rejected"] += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Ingestion buffer full, retry later", headers={"Retry-After": "1"})
+        finally:
+            self._putting -= 1
+        self.counters["accepted"] += 1
+        return row["id"]
+
+    async def _next_batch(self) -> list[dict]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_rows:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = self._batch = await self._next_batch()
+            try:
+                await self._flush(batch)
+                self._batch = []  # Kept for stop() if the writer is cancelled mid-batch
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, rows: list[dict]):
+        async with async_session() as db:
+            type_ids = await recycle_types.ids_for(db, (row["type"] for row in rows))
+            rows = [{key: value for key, value in row.items() if key != "type"} | {"type_id": type_ids[row["type"]]}
+                    for row in rows]
+            await db.execute(insert(Recycle), rows)
+            deltas = RollupDeltas()
+            for row in rows:
+                deltas.add(SimpleNamespace(**row))
+            await apply_rollup_deltas(db, deltas)
+            await db.commit()
+            await bump_version(db, "recycles")
+
+    async def _write_retrying(self, rows: list[dict]):
+        """Write `rows`, retrying with backoff on anything but a row error until the shutdown deadline."""
+        delay = RETRY_DELAY
+        while True:
+            try:
+                return await self._write(rows)
+            except ROW_ERRORS:
+                raise
+            except Exception:
+                if self._deadline is not None and asyncio.get_running_loop().time() + delay >= self._deadline:
+                    raise
+                self.counters["retries"] += 1
+                logger.exception("Recycle ingest write of %d row(s) failed, retrying in %.1fs", len(rows), delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+
+    async def _flush(self, rows: list[dict]):
+        try:
+            await self._write_retrying(rows)
+            self.counters["flushed"] += len(rows)
+        except ROW_ERRORS:
+            # One bad row (e.g. its schedule was deleted since it was accepted) must not
+            # sink the batch: write the rows one by one and drop those that still fail.
+            # A batch whose COMMIT landed before its connection dropped also ends up here,
+            # as duplicate keys, and is counted failed rather than written twice.
+            logger.exception("Recycle ingest batch of %d failed, retrying row by row", len(rows))
+            for index, row in enumerate(rows):
+                try:
+                    await self._write_retrying([row])
+                    self.counters["flushed"] += 1
+                except ROW_ERRORS:
+                    logger.exception("Dropping buffered recycle log %s", row["id"])
+                    self.counters["failed"] += 1
+                except Exception:
+                    self._spill(rows[index:])
+                    break
+        except Exception:
+            # Only past the shutdown deadline does a write give up on other errors
+            self._spill(rows)
+
+        self.counters["batches"] += 1
+        self.last_batch_rows = len(rows)
+        self.last_flush_at = datetime.now(timezone.utc)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.recycle_ingest_buffered,
+            "running": self._task is not None,
+            "depth": self.depth,
+            "capacity": self.maxsize,
+            **self.counters,
+            "last_batch_rows": self.last_batch_rows,
+            "last_flush_at": self.last_flush_at,
+        }
+
+
+ingest_buffer = RecycleIngestBuffer(
+    maxsize=settings.recycle_ingest_queue_size,
+    batch_rows=settings.recycle_ingest_batch_rows,
+    flush_interval=settings.recycle_ingest_flush_interval_ms / 1000,
+    enqueue_timeout=settings.recycle_ingest_enqueue_timeout_ms / 1000,
+    drain_timeout=settings.recycle_ingest_drain_timeout_s,
+    spill_dir=settings.recycle_ingest_spill_dir,
+)
+INGEST_DEPTH.set_function(lambda: ingest_buffer.depth)
@@ -0,0 +1,110 @@
+from typing import Iterable, Mapping, Optional
+
+from sqlalchemy import ColumnElement
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+
+from app.database import async_session
+from app.models.recycle import RecycleType
+from app.models.schedule import ScheduleDay, ScheduleFrequency
+
+
+class Lookup:
+    """
+    Process-local id <-> name map of one lookup table.
+
+    Lookup rows are only ever added, never renamed or deleted, so a cached entry
+    never goes stale and nothing is invalidated: a miss is the only reason to query.
+    The map holds a handful of rows per table and is filled lazily. `db` may be any
+    session or connection; names it has not seen are inserted and committed on a
+    connection of their own, so an id is only cached once its row is durable,
+    whatever happens to the caller's transaction.
+    """
+
+    def __init__(self, model):
+        self.table = model.__table__
+        self._ids: dict[str, int] = {}
+        self._names: dict[int, str] = {}
+
+    def _remember(self, rows):
+        for row_id, name in rows:
+            self._ids[name] = row_id
+            self._names[row_id] = name
+
+    async def ids_for(self, db, names: Iterable[str]) -> dict[str, int]:
+        """Ids of `names`, creating rows for names that do not exist yet."""
+        names = set(names)
+        missing = names - self._ids.keys()
+        if missing:
+            table = self.table
+            self._remember(await db.execute(select(table.c.id, table.c.name).where(table.c.name.in_(missing))))
+            missing -= self._ids.keys()
+        if missing:
+            async with async_session() as session:
+                # Sorted, so concurrent writers take the unique index locks in the same order
+                await session.execute(
+                    insert(table).values([{"name": name} for name in sorted(missing)])
+                    .on_conflict_do_nothing(index_elements=[table.c.name])
+                )
+                result = await session.execute(select(table.c.id, table.c.name).where(table.c.name.in_(missing)))
+                await session.commit()
+            self._remember(result.all())
+        return {name: self._ids[name] for name in names}
+
+    async def id_for(self, db, name: str) -> int:
+        return (await self.ids_for(db, [name]))[name]
+
+    def id_clause(self, column, name: str) -> ColumnElement:
+        """`column = <id of name>`, resolved from the cache or, on a miss, by the database itself."""
+        cached = self._ids.get(name)
+        if cached is not None:
+            return column == cached
+        # Unknown names match nothing rather than being created by a read
+        return column == select(self.table.c.id).where(self.table.c.name == name).scalar_subquery()
+
+    async def names_for(self, db, ids: Iterable[int]) -> dict[int, str]:
+        ids = set(ids)
+        missing = ids - self._names.keys()
+        if missing:
+            table = self.table
+            self._remember(await db.execute(select(table.c.id, table.c.name).where(table.c.id.in_(missing))))
+        return {row_id: self._names[row_id] for row_id in ids}
+
+    async def name_for(self, db, row_id: int) -> str:
+        return (await self.names_for(db, [row_id]))[row_id]
+
+    def cached_name(self, row_id: int) -> str:
+        """Name of an id already loaded with `names_for`."""
+        return self._names[row_id]
+
+    def cached_id(self, name: str) -> Optional[int]:
+        return self._ids.get(name)
+
+
+recycle_types = Lookup(RecycleType)
+schedule_days = Lookup(ScheduleDay)
+schedule_frequencies = Lookup(ScheduleFrequency)
+
+# Id column of a select -> the key its name goes out under and the lookup that maps it
+NameColumns = Mapping[str, tuple[str, Lookup]]
+
+
+async def decode_names(db, items: list[dict], columns: NameColumns) -> list[dict]:
+    """
+    Replace the lookup ids in plain row dicts by their names, keeping the key order.
+
+    One `names_for` per lookup for the whole batch, answered from the cache once the
+    ids have been seen, so reads select the stored ids instead of resolving names per row.
+    """
+    columns = {key: target for key, target in columns.items() if items and key in items[0]}
+    if not columns:
+        return items
+    names = {}
+    for key, (_, lookup) in columns.items():
+        names[key] = await lookup.names_for(db, {item[key] for item in items if item[key] is not None})
+        names[key][None] = None
+    return [
+        {(columns[key][0] if key in columns else key): (names[key][value] if key in columns else value)
+         for key, value in item.items()}
+        for item in items
+    ]
@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from typing import Sequence, Union
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def encode_cursor(sort_value: Union[datetime, float], row_id: UUID) -> str:
+    """Build an opaque keyset cursor from the last row of a page, sorted by a timestamp or a score."""
+    value = sort_value.isoformat() if isinstance(sort_value, datetime) else sort_value
+    payload = json.dumps([value, str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, expected: type = datetime) -> tuple[Union[datetime, float], UUID]:
+    """
+    Turn a cursor produced by `encode_cursor` back into its (sort value, id) pair.
+
+    `expected` is the sort value type of the endpoint (datetime or float); a cursor
+    carrying the other kind, e.g. one taken from a different endpoint, is rejected
+    with 400 like any other malformed cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(sort_value, (int, float)) and not isinstance(sort_value, bool):
+            sort_value = float(sort_value)
+        elif isinstance(sort_value, str):
+            sort_value = datetime.fromisoformat(sort_value)
+        if not isinstance(sort_value, expected):
+            raise ValueError(sort_value)
+        return sort_value, UUID(row_id)
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+async def explain(db: AsyncSession, query) -> dict:
+    """Return the planner's JSON plan for a select, with its parameters bound server-side."""
+    conn = await db.connection()
+    compiled = query.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup or ())
+    result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + compiled.string, params)
+    return result.scalar_one()[0]["Plan"]
+
+
+async def count_rows(db: AsyncSession, model, exact: bool = False, where: Sequence = ()) -> int:
+    """
+    Count the rows of a model's table, optionally restricted by `where` clauses.
+
+    By default the planner's estimate is used instead of a scan: pg_class.reltuples
+    for the whole table, or the row estimate of an EXPLAIN when filtered. Tables that
+    have never been analyzed have no estimate yet, so they fall back to an exact count.
+    A partitioned table is summed over its partitions, since autovacuum analyzes them
+    but never the parent.
+    """
+    if not exact and where:
+        plan = await explain(db, select(model.id).where(*where))
+        return plan["Plan Rows"]
+
+    if not exact:
+        # Partitions not analyzed yet (e.g. created ahead of their month) count as empty
+        result = await db.execute(
+            text(
+                "SELECT sum(greatest(c.reltuples, 0))::bigint, bool_and(c.reltuples < 0) "
+                "FROM pg_partition_tree(to_regclass(:table_name)) AS tree "
+                "JOIN pg_class c ON c.oid = tree.relid WHERE tree.isleaf"
+            ),
+            {"table_name": model.__tablename__},
+        )
+        estimate, unanalyzed = result.one()
+        if estimate is not None and not unanalyzed:
+            return estimate
+
+    result = await db.execute(select(func.count()).select_from(model).where(*where))
+    return result.scalar_one()
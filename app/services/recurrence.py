@@ -0,0 +1,201 @@
+import re
+from calendar import monthrange
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import numpy as np
+
+WEEKDAY_NAMES = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+ALL_DAYS = 0b1111111
+
+_DAY_ALIASES = {
+    "daily": ALL_DAYS,
+    "everyday": ALL_DAYS,
+    "every day": ALL_DAYS,
+    "any": ALL_DAYS,
+    "weekdays": 0b0011111,
+    "weekends": 0b1100000,
+}
+
+_FREQUENCY_ALIASES = {
+    "daily": ("day", 1),
+    "weekly": ("week", 1),
+    "biweekly": ("week", 2),
+    "bi-weekly": ("week", 2),
+    "fortnightly": ("week", 2),
+    "monthly": ("month", 1),
+    "quarterly": ("month", 3),
+}
+_EVERY_N = re.compile(r"every\s+(\d+)\s+(day|week|month)s?")
+
+UNIT_CODES = {"day": 0, "week": 1, "month": 2}
+
+# How far ahead next_occurrence searches before giving up, in days per interval step
+_SEARCH_DAYS = 400
+
+
+@dataclass(frozen=True)
+class Recurrence:
+    """
+    Parsed form of a schedule's free-text `day` and `frequency`.
+
+    Occurrences fall at the anchor's UTC time of day, never before the anchor date:
+    - unit "day": every `interval` days counted from the anchor, on days in `weekdays`
+    - unit "week": on each day in `weekdays`, in every `interval`-th week from the anchor's week
+    - unit "month": on `monthday` (clamped to the month's length) of every `interval`-th month
+    """
+    unit: str
+    interval: int
+    weekdays: int  # Bitmask, bit 0 = Monday
+    monthday: Optional[int]
+
+
+def _parse_day(day: str) -> tuple[int, Optional[int]]:
+    text = day.strip().lower()
+    if text in _DAY_ALIASES:
+        return _DAY_ALIASES[text], None
+    if text.isdigit():
+        monthday = int(text)
+        if not 1 <= monthday <= 31:
+            raise ValueError(f"Day of month out of range: {day!r}")
+        return 0, monthday
+
+    mask = 0
+    for token in re.split(r"\s*(?:,|/|&|\band\b|\s)\s*", text):
+        if not token:
+            continue
+        matches = [index for index, name in enumerate(WEEKDAY_NAMES) if len(token) >= 3 and name.startswith(token)]
+        if len(matches) != 1:
+            raise ValueError(f"Unrecognised day: {day!r}")
+        mask |= 1 << matches[0]
+    if not mask:
+        raise ValueError(f"Unrecognised day: {day!r}")
+    return mask, None
+
+
+def _parse_frequency(frequency: str) -> tuple[str, int]:
+    text = frequency.strip().lower()
+    if text in _FREQUENCY_ALIASES:
+        return _FREQUENCY_ALIASES[text]
+    match = _EVERY_N.fullmatch(text)
+    if match and int(match.group(1)) >= 1:
+        return match.group(2), int(match.group(1))
+    raise ValueError(f"Unrecognised frequency: {frequency!r}")
+
+
+@lru_cache(maxsize=1024)
+def parse_recurrence(day: str, frequency: str) -> Recurrence:
+    """Parse and validate a schedule's day/frequency pair; raises ValueError if they don't describe a recurrence."""
+    unit, interval = _parse_frequency(frequency)
+    weekdays, monthday = _parse_day(day)
+
+    if unit == "month":
+        if weekdays not in (0, ALL_DAYS):
+            raise ValueError("Monthly schedules take a day of the month, not weekdays")
+        return Recurrence(unit, interval, ALL_DAYS, monthday)
+    if monthday is not None:
+        raise ValueError("A day of the month needs a monthly frequency")
+    return Recurrence(unit, interval, weekdays, None)
+
+
+def _utc(anchor: datetime) -> datetime:
+    return anchor.astimezone(timezone.utc) if anchor.tzinfo else anchor.replace(tzinfo=timezone.utc)
+
+
+def occurs_on(recurrence: Recurrence, anchor: datetime, day: date) -> bool:
+    anchor_day = _utc(anchor).date()
+    if day < anchor_day or not recurrence.weekdays >> day.weekday() & 1:
+        return False
+    if recurrence.unit == "day":
+        return (day - anchor_day).days % recurrence.interval == 0
+    if recurrence.unit == "week":
+        anchor_monday = anchor_day - timedelta(days=anchor_day.weekday())
+        return (day - anchor_monday).days // 7 % recurrence.interval == 0
+    months = (day.year - anchor_day.year) * 12 + day.month - anchor_day.month
+    target = min(recurrence.monthday or anchor_day.day, monthrange(day.year, day.month)[1])
+    return months % recurrence.interval == 0 and day.day == target
+
+
+def next_occurrence(recurrence: Recurrence, anchor: datetime, after: datetime) -> Optional[datetime]:
+    """First occurrence at or after `after`, or None if there is none within the search horizon."""
+    anchor = _utc(anchor)
+    after = _utc(after)
+    time_of_day = anchor.timetz()
+    day = max(after.date(), anchor.date())
+    for _ in range(_SEARCH_DAYS * recurrence.interval):
+        if occurs_on(recurrence, anchor, day):
+            candidate = datetime.combine(day, time_of_day)
+            if candidate >= after:
+                return candidate
+        day += timedelta(days=1)
+    return None
+
+
+def schedule_next_run(day: str, frequency: str, anchor: datetime, after: Optional[datetime] = None) -> datetime:
+    """Validate a schedule's recurrence and compute its next run; raises ValueError if it has none."""
+    after = after or datetime.now(timezone.utc)
+    next_run = next_occurrence(parse_recurrence(day, frequency), anchor, after)
+    if next_run is None:
+        raise ValueError("Schedule never recurs")
+    return next_run
+
+
+def expand_occurrences(schedules: Sequence, start: datetime, end: datetime) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Expand many schedules into their occurrences in [start, end) in one vectorized pass.
+
+    `schedules` are (day, frequency, time) rows. Returns `(index, at)`: the position of
+    the schedule in `schedules` and the occurrence as datetime64[s] (UTC), sorted by
+    time. Schedules whose recurrence does not parse are skipped.
+    """
+    rows = []
+    for position, (day, frequency, anchor) in enumerate(schedules):
+        try:
+            recurrence = parse_recurrence(day, frequency)
+        except ValueError:
+            continue
+        anchor = _utc(anchor)
+        anchor_day = (anchor.date() - date(1970, 1, 1)).days
+        rows.append((
+            position, UNIT_CODES[recurrence.unit], recurrence.interval, recurrence.weekdays,
+            recurrence.monthday or anchor.day, anchor_day,
+            anchor.hour * 3600 + anchor.minute * 60 + anchor.second,
+        ))
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[s]")
+
+    position, unit, interval, weekdays, monthday, anchor_day, seconds = (
+        np.array(column, dtype=np.int64)[:, None] for column in zip(*rows)
+    )
+
+    # Day grid covering the range, as days since the epoch
+    start, end = _utc(start), _utc(end)
+    first = (start.date() - date(1970, 1, 1)).days
+    last = (end.date() - date(1970, 1, 1)).days
+    days = np.arange(first, last + 1, dtype=np.int64)[None, :]
+
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+    on_weekday = (weekdays >> weekday) & 1 == 1
+    since_anchor = days - anchor_day
+
+    daily = since_anchor % interval == 0
+    anchor_monday = anchor_day - (anchor_day + 3) % 7
+    weekly = (days - anchor_monday) // 7 % interval == 0
+
+    months = days.astype("datetime64[D]").astype("datetime64[M]")
+    month_start = months.astype("datetime64[D]").astype(np.int64)
+    month_length = (months + 1).astype("datetime64[D]").astype(np.int64) - month_start
+    anchor_month = anchor_day.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    monthly = ((months.astype(np.int64) - anchor_month) % interval == 0) & (
+        days - month_start + 1 == np.minimum(monthday, month_length)
+    )
+
+    due = (since_anchor >= 0) & on_weekday & np.select([unit == 0, unit == 1], [daily, weekly], monthly)
+    schedule_index, day_index = np.nonzero(due)
+    at = days[0, day_index] * 86400 + seconds[schedule_index, 0]
+
+    in_range = (at >= int(start.timestamp())) & (at < int(end.timestamp()))
+    order = np.argsort(at[in_range], kind="stable")
+    return position[schedule_index[in_range], 0][order], at[in_range][order].astype("datetime64[s]")
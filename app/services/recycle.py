@@ -1,80 +1,226 @@
+from datetime import datetime
+from types import SimpleNamespace
+from typing import AsyncIterator, Optional
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from app.models.changes import CHANGE_COLUMNS
 from app.models.recycle import Recycle
-from app.models.schedule import Schedule
+from app.services.export import ExportFormat, stream_rows
+from app.services.schedule_cache import existing_schedule_ids, schedule_exists
+from app.services.rollup import RollupDeltas, apply_rollup_deltas
+from app.services.lookups import decode_names, recycle_types
+from app.services.response_cache import bump_version
+from app.services.serialization import rows_payload
 from uuid import UUID
-from app.schemas.recycle import RecycleCreate, RecycleUpdate, RecycleOut
+from app.schemas.recycle import RecycleCreate, RecycleUpdate, RecycleOut, RecycleBulkResult, RecycleFilters
 from fastapi import HTTPException, status
 
 
+# Columns of recycle reads; the stored type_id is mapped to its name by RECYCLE_NAMES
+# from the lookup cache instead of a subquery per row
+RECYCLE_COLUMNS = [column for column in Recycle.__table__.c if column.key not in CHANGE_COLUMNS]
+RECYCLE_NAMES = {"type_id": ("type", recycle_types)}
+
+
+async def recycles_payload(db: AsyncSession, rows) -> list[dict]:
+    """Plain dicts for rows selected with RECYCLE_COLUMNS, with type names, ready for `to_json`."""
+    return await decode_names(db, rows_payload(rows), RECYCLE_NAMES)
+
+
+async def encode_recycles(db: AsyncSession, recycles) -> list[dict]:
+    """Column values for validated RecycleCreate models, with type names replaced by their ids."""
+    type_ids = await recycle_types.ids_for(db, (recycle.type for recycle in recycles))
+    rows = []
+    for recycle in recycles:
+        values = recycle.model_dump()
+        values["type_id"] = type_ids[values.pop("type")]
+        rows.append(values)
+    return rows
+
+
+async def decode_recycle(db: AsyncSession, row) -> RecycleOut:
+    """RecycleOut for a row read with the stored type_id, e.g. from RETURNING."""
+    values = row._asdict()
+    values["type"] = await recycle_types.name_for(db, values["type_id"])
+    return RecycleOut.model_validate(values)
+
+
+def recycle_filter_clauses(filters: Optional[RecycleFilters]) -> list:
+    # Each combination is served by (type, date), (schedule_id, date) or (date, id)
+    if filters is None:
+        return []
+    clauses = []
+    if filters.type is not None:
+        clauses.append(recycle_types.id_clause(Recycle.type_id, filters.type))
+    if filters.schedule_id is not None:
+        clauses.append(Recycle.schedule_id == filters.schedule_id)
+    if filters.date_from is not None:
+        clauses.append(Recycle.date >= filters.date_from)
+    if filters.date_to is not None:
+        clauses.append(Recycle.date < filters.date_to)
+    return clauses
+
+
+
 async def create_recycle(db: AsyncSession, recycle: RecycleCreate):
     # Check if the schedule_id exists in the schedules table
-    result = await db.execute(select(Schedule).filter(Schedule.id == recycle.schedule_id))
-    db_schedule = result.scalar_one_or_none()
-
-    if db_schedule is None:
+    if not await schedule_exists(db, recycle.schedule_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid schedule_id, schedule not found")
 
     # Proceed to create the recycle entry
-    db_recycle = Recycle(**recycle.model_dump())
+    [values] = await encode_recycles(db, [recycle])
+    db_recycle = Recycle(**values)
     db.add(db_recycle)
+
+    # Keep the daily rollup in the same transaction as the write
+    deltas = RollupDeltas()
+    deltas.add(db_recycle)
+    await apply_rollup_deltas(db, deltas)
     await db.commit()
+    await bump_version(db, "recycles")
     await db.refresh(db_recycle)
     return db_recycle
 
 
 
-async def get_recycles(db: AsyncSession):
-    # Execute the query with offset and limit
-    result = await db.execute(select(Recycle))
-    recycles = result.scalars().all()
-    return [RecycleOut.model_validate(recycle) for recycle in recycles]
+async def bulk_create_recycles(db: AsyncSession, items: list) -> RecycleBulkResult:
+    """
+    Insert a batch of recycle logs in a single transaction.
+
+    Every row is validated up front and all distinct schedule_ids are checked with at
+    most one query. Rows that fail are reported by index and skipped; the remaining
+    rows are written with batched multi-row INSERT ... RETURNING and one COMMIT.
+    """
+    errors = []
+    candidates = []
+    for index, item in enumerate(items):
+        try:
+            candidates.append((index, RecycleCreate.model_validate(item)))
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.errors(include_url=False, include_context=False)})
+
+    known_schedule_ids = await existing_schedule_ids(db, (recycle.schedule_id for _, recycle in candidates))
+
+    valid = []
+    for index, recycle in candidates:
+        if recycle.schedule_id in known_schedule_ids:
+            valid.append((index, recycle))
+        else:
+            errors.append({"index": index, "errors": ["Invalid schedule_id, schedule not found"]})
+
+    created = []
+    if valid:
+        rows = await encode_recycles(db, [recycle for _, recycle in valid])
+        result = await db.execute(insert(Recycle).returning(Recycle.id, sort_by_parameter_order=True), rows)
+        created = [{"index": index, "id": recycle_id} for (index, _), recycle_id in zip(valid, result.scalars().all())]
+
+        deltas = RollupDeltas()
+        for row in rows:
+            deltas.add(SimpleNamespace(**row))
+        await apply_rollup_deltas(db, deltas)
+        await db.commit()
+        await bump_version(db, "recycles")
+
+    errors.sort(key=lambda error: error["index"])
+    return RecycleBulkResult(inserted=len(created), created=created, errors=errors)
+
 
 
+async def get_recycles(db: AsyncSession, filters: Optional[RecycleFilters] = None):
+    # Core column select: plain rows, no ORM identity map or per-row model validation
+    result = await db.execute(select(*RECYCLE_COLUMNS).where(*recycle_filter_clauses(filters)))
+    return result.all()
 
-async def get_paginated_recycles(db: AsyncSession, skip: int = 0, limit: int = 50) -> dict:
-   result = await db.execute(select(Recycle).offset(skip).limit(limit))
-   recycles = result.scalars().all()
-   return [RecycleOut.model_validate(recycle) for recycle in recycles]
 
 
+async def stream_recycles(db: AsyncSession, fmt: ExportFormat,
+                          filters: Optional[RecycleFilters] = None) -> AsyncIterator[bytes]:
+    # Core column select: rows go straight to the encoder without ORM objects
+    query = select(*RECYCLE_COLUMNS).where(*recycle_filter_clauses(filters)).order_by(Recycle.date, Recycle.id)
+    async for chunk in stream_rows(db, query, fmt, RECYCLE_NAMES):
+        yield chunk
 
-async def get_recycle(db: AsyncSession, recycle_id: UUID):
-    result = await db.execute(select(Recycle).filter(Recycle.id == recycle_id))
-    return result.scalar_one_or_none()
+
+
+async def get_paginated_recycles(db: AsyncSession, skip: int = 0, limit: int = 50,
+                                 after: Optional[tuple[datetime, UUID]] = None,
+                                 filters: Optional[RecycleFilters] = None):
+   # Pages are ordered on (date, id) so that a keyset cursor can resume from the last row
+   query = (
+       select(*RECYCLE_COLUMNS)
+       .where(*recycle_filter_clauses(filters))
+       .order_by(Recycle.date, Recycle.id)
+       .limit(limit)
+   )
+   if after is not None:
+       query = query.where(tuple_(Recycle.date, Recycle.id) > tuple_(*after))
+   else:
+       query = query.offset(skip)
+   result = await db.execute(query)
+   return result.all()
+
+
+
+async def get_recycle(db: AsyncSession, recycle_id: UUID) -> Optional[dict]:
+    result = await db.execute(select(*RECYCLE_COLUMNS).where(Recycle.id == recycle_id))
+    payload = await recycles_payload(db, result.all())
+    return payload[0] if payload else None
 
 
 
 async def update_recycle(db: AsyncSession, recycle_id: UUID, recycle_update: RecycleUpdate):
-    # Check if the recycle entry exists
-    db_recycle = await get_recycle(db, recycle_id)
-    if db_recycle is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recycle entry not found")
+    values = recycle_update.model_dump(exclude_unset=True)
+    if "type" in values:
+        name = values.pop("type")
+        values["type_id"] = await recycle_types.id_for(db, name) if name is not None else None
 
     # If there's a schedule_id in the update, validate it
     if recycle_update.schedule_id:
-        result = await db.execute(select(Schedule).filter(Schedule.id == recycle_update.schedule_id))
-        db_schedule = result.scalar_one_or_none()
-
-        if db_schedule is None:
+        if not await schedule_exists(db, recycle_update.schedule_id):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                 detail="Invalid schedule_id, schedule not found")
 
-    # Update fields
-    for key, value in recycle_update.model_dump(exclude_unset=True).items():
-        setattr(db_recycle, key, value)
+    if not values:
+        db_recycle = await get_recycle(db, recycle_id)
+        if db_recycle is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recycle entry not found")
+        return db_recycle
 
-    # Commit and refresh the updated recycle entry
+    # One statement: lock the current row, update it and return both versions.
+    # The old values are needed to move the row's contribution in the daily rollup.
+    table = Recycle.__table__
+    old = select(table).where(table.c.id == recycle_id).with_for_update().subquery("old")
+    stmt = (
+        update(table)
+        .where(table.c.id == old.c.id)
+        .values(**values)
+        .returning(*table.c, *[column.label(f"old_{column.name}") for column in old.c])
+    )
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recycle entry not found")
+
+    deltas = RollupDeltas()
+    deltas.add(SimpleNamespace(**{name: getattr(row, f"old_{name}") for name in table.c.keys()}), sign=-1)
+    deltas.add(row)
+    await apply_rollup_deltas(db, deltas)
     await db.commit()
-    await db.refresh(db_recycle)
-    return db_recycle
+    await bump_version(db, "recycles")
+    return await decode_recycle(db, row)
 
 
 
 async def delete_recycle(db: AsyncSession, recycle_id: UUID):
-    db_recycle = await get_recycle(db, recycle_id)
-    if db_recycle:
-        await db.delete(db_recycle)
-        await db.commit()
-        return db_recycle
-    return None
+    table = Recycle.__table__
+    row = (await db.execute(delete(table).where(table.c.id == recycle_id).returning(*table.c))).first()
+    if row is None:
+        return None
+
+    deltas = RollupDeltas()
+    deltas.add(row, sign=-1)
+    await apply_rollup_deltas(db, deltas)
+    await db.commit()
+    await bump_version(db, "recycles")
+    return await decode_recycle(db, row)
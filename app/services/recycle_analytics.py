@@ -0,0 +1,392 @@
+import asyncio
+import logging
+import time
+from datetime import date, timedelta
+from typing import Callable, Optional, Sequence
+from uuid import UUID
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy import cast, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.types import BigInteger
+
+from app.config import settings
+from app.database import engine, replica_engine, replica_monitor
+from app.models.recycle import Recycle
+from app.services.changes import SNAPSHOT_XMIN
+from app.services.lookups import recycle_types
+from app.services.response_cache import version_tag
+
+logger = logging.getLogger(__name__)
+
+DAY_US = 86_400_000_000
+EPOCH = date(1970, 1, 1)
+
+# Rows fetched per round trip while loading
+LOAD_CHUNK_SIZE = 20000
+INITIAL_CAPACITY = 1024
+
+# Above this many possible groups the group keys are factorized with np.unique
+# instead of counted into a dense bincount array
+MAX_DENSE_GROUPS = 1 << 22
+
+
+class Dictionary:
+    """Dictionary encoding of a column: each distinct value gets the next int32 code."""
+
+    def __init__(self):
+        self.codes: dict = {}
+        self._values: Optional[list] = None
+
+    def encode(self, values: Sequence) -> np.ndarray:
+        codes = self.codes
+        encoded = np.fromiter((codes.setdefault(value, len(codes)) for value in values), np.int32, len(values))
+        self._values = None
+        return encoded
+
+    @property
+    def values(self) -> list:
+        if self._values is None:
+            self._values = list(self.codes)
+        return self._values
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class RecycleColumns:
+    """
+    Growable column arrays for the recycle snapshot.
+
+    Rows are appended into spare capacity and only then counted in `size`, so views
+    handed out earlier stay valid and never see half-written rows. Capacity doubles
+    when it runs out, keeping appends amortized O(rows added).
+    """
+
+    FIELDS = {"date": np.int64, "quantity": np.float64, "type": np.int32, "schedule": np.int32}
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.size = 0
+        self.arrays = {name: np.empty(capacity, dtype) for name, dtype in self.FIELDS.items()}
+
+    @property
+    def capacity(self) -> int:
+        return len(self.arrays["date"])
+
+    def append(self, chunk: dict[str, np.ndarray]):
+        count = len(chunk["date"])
+        needed = self.size + count
+        if needed > self.capacity:
+            capacity = max(self.capacity * 2, needed)
+            for name, array in self.arrays.items():
+                grown = np.empty(capacity, array.dtype)
+                grown[:self.size] = array[:self.size]
+                self.arrays[name] = grown
+        for name, values in chunk.items():
+            self.arrays[name][self.size:needed] = values
+        self.size = needed
+
+    def view(self) -> dict[str, np.ndarray]:
+        return {name: array[:self.size] for name, array in self.arrays.items()}
+
+    def nbytes(self) -> dict[str, int]:
+        return {name: array.nbytes for name, array in self.arrays.items()}
+
+
+class RecycleAnalytics:
+    """
+    In-process columnar snapshot of the `recycle` table for vectorized aggregations.
+
+    The first use loads every row in bulk; after that, reads older than the refresh
+    interval (or following a recycle write in this process) first append the rows
+    inserted since. The watermark is a transaction id horizon, the xmin of the last
+    snapshot read: every transaction below it has finished, so a refresh reads the
+    change_xid range from the watermark up to its own xmin through the changes feed
+    index and sees each insert exactly once, whatever the row's id. Rows the load
+    already saw above its xmin are remembered and skipped. Updated rows (whose
+    updated_at moved past created_at) and deletes only show up at the next full
+    reload, as does a row updated before a refresh got to it.
+
+    Full reloads after the first run in a background task, from the replica when
+    one is configured and fresh enough, and swap the new snapshot in when they
+    finish; requests keep answering from the previous one meanwhile.
+    """
+
+    def __init__(self, refresh_interval: float, full_reload_interval: float):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.columns: Optional[RecycleColumns] = None
+        self.types = Dictionary()
+        self.schedules = Dictionary()
+        self.watermark: Optional[int] = None
+        self._seen: dict[UUID, int] = {}  # Held rows at or above the watermark -> their change_xid
+        self._lock: Optional[asyncio.Lock] = None
+        self._reload: Optional[asyncio.Task] = None
+        self._version = None
+        self.loaded_at = float("-inf")
+        self.refreshed_at = float("-inf")
+        self.counters = {"full_loads": 0, "failed_loads": 0, "refreshes": 0, "rows_appended": 0}
+        self.last_load_ms = 0.0
+        self.last_refresh_ms = 0.0
+
+    @staticmethod
+    def _select():
+        table = Recycle.__table__
+        return select(
+            table.c.id,
+            table.c.change_xid,
+            # Microseconds since the epoch, computed server-side so no datetimes are built here
+            cast(func.extract("epoch", table.c.date) * 1_000_000, BigInteger).label("date_us"),
+            table.c.quantity,
+            table.c.type_id,  # Already a small integer; names come from the lookup cache
+            table.c.schedule_id,
+        )
+
+    def _encode(self, rows, types: Dictionary, schedules: Dictionary) -> dict[str, np.ndarray]:
+        _, _, dates, quantities, type_values, schedule_values = zip(*rows)
+        return {
+            "date": np.fromiter(dates, np.int64, len(rows)),
+            "quantity": np.fromiter(quantities, np.float64, len(rows)),
+            "type": types.encode(type_values),
+            "schedule": schedules.encode(schedule_values),
+        }
+
+    def _advance(self, watermark: int, rows=()):
+        """Move the watermark up and remember the held rows still at or above it."""
+        self.watermark = max(self.watermark or 0, watermark)
+        self._seen.update((row[0], row[1]) for row in rows)
+        self._seen = {row_id: xid for row_id, xid in self._seen.items() if xid >= self.watermark}
+
+    @staticmethod
+    async def _bulk_engine() -> AsyncEngine:
+        """The replica while it is within WMS_REPLICA_MAX_LAG_MS, otherwise the primary."""
+        if replica_monitor is None:
+            return engine
+        lag = await replica_monitor.current_lag()
+        if lag is None or lag * 1000 > settings.replica_max_lag_ms:
+            return engine
+        return replica_engine
+
+    async def load(self):
+        """
+        Read every row in one repeatable-read transaction, then swap the new snapshot in.
+
+        Only the swap takes the lock, so refreshes and aggregations carry on against the
+        current snapshot while the rows stream in.
+        """
+        start = time.perf_counter()
+        started = time.monotonic()
+        columns, types, schedules = RecycleColumns(), Dictionary(), Dictionary()
+        async with (await self._bulk_engine()).connect() as conn:
+            await conn.execution_options(isolation_level="REPEATABLE READ")
+            table = Recycle.__table__
+            watermark = (await conn.execute(SNAPSHOT_XMIN)).scalar_one()
+            result = await conn.stream(self._select().execution_options(yield_per=LOAD_CHUNK_SIZE))
+            async for rows in result.partitions():
+                columns.append(self._encode(rows, types, schedules))
+            # Same snapshot: rows of transactions at or above its xmin that it already
+            # saw, which the first refresh must not append twice
+            seen = (await conn.execute(
+                select(table.c.id, table.c.change_xid).where(table.c.change_xid >= watermark)
+            )).all()
+            await recycle_types.names_for(conn, types.codes)
+            await conn.rollback()
+
+        self._lock = self._lock or asyncio.Lock()
+        async with self._lock:
+            self.columns, self.types, self.schedules = columns, types, schedules
+            self.watermark, self._seen = None, {}
+            self._advance(watermark, seen)
+            # Rows written while this load ran are appended by the next refresh
+            self.loaded_at = self.refreshed_at = started
+            self._version = None
+        self.counters["full_loads"] += 1
+        self.last_load_ms = (time.perf_counter() - start) * 1000
+
+    async def _reload_in_background(self):
+        try:
+            await self.load()
+        except Exception:
+            # The previous snapshot stays in use; the next request starts another reload
+            self.counters["failed_loads"] += 1
+            logger.exception("Recycle analytics full reload failed")
+        finally:
+            self._reload = None
+
+    async def refresh(self):
+        """Append the rows inserted by transactions between the watermark and the current xmin."""
+        start = time.perf_counter()
+        table = Recycle.__table__
+        async with engine.connect() as conn:
+            # Every transaction below xmin has finished, so the range read here is complete
+            xmin = (await conn.execute(SNAPSHOT_XMIN)).scalar_one()
+            query = self._select().where(
+                table.c.change_xid >= self.watermark,
+                table.c.change_xid < xmin,
+                # Inserted, not updated: track_change sets updated_at to created_at's now() on insert
+                table.c.created_at == table.c.updated_at,
+            )
+            result = await conn.stream(query.execution_options(yield_per=LOAD_CHUNK_SIZE))
+            async for rows in result.partitions():
+                rows = [row for row in rows if row[0] not in self._seen]
+                if rows:
+                    self.columns.append(self._encode(rows, self.types, self.schedules))
+                    self.counters["rows_appended"] += len(rows)
+            await recycle_types.names_for(conn, self.types.codes)
+        self._advance(xmin)
+        self.refreshed_at = time.monotonic()
+        self.counters["refreshes"] += 1
+        self.last_refresh_ms = (time.perf_counter() - start) * 1000
+
+    async def ensure_fresh(self):
+        if not settings.recycle_analytics_enabled:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Recycle analytics are disabled; set WMS_RECYCLE_ANALYTICS_ENABLED")
+        if self._reload is None and (self.columns is None
+                                     or time.monotonic() - self.loaded_at >= self.full_reload_interval):
+            self._reload = asyncio.create_task(self._reload_in_background())
+        if self.columns is None:
+            # Nothing to answer from yet, so the first load is waited for
+            await asyncio.shield(self._reload)
+            if self.columns is None:
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    detail="Recycle analytics snapshot failed to load; try again later")
+
+        self._lock = self._lock or asyncio.Lock()
+        async with self._lock:
+            version = version_tag(["recycles"])
+            if time.monotonic() - self.refreshed_at >= self.refresh_interval or version != self._version:
+                await self.refresh()
+            self._version = version
+
+    async def stop(self):
+        """Cancel a full reload still running at shutdown."""
+        if self._reload is not None:
+            self._reload.cancel()
+            await asyncio.gather(self._reload, return_exceptions=True)
+
+    def _group_keys(self, dimension: str, view: dict[str, np.ndarray]) -> tuple[np.ndarray, int, Callable]:
+        """Dense int64 codes for one dimension, their cardinality and a code -> label decoder."""
+        if dimension == "type":
+            values = self.types.values
+            return view["type"].astype(np.int64), len(values), lambda code: recycle_types.cached_name(values[code])
+        if dimension == "schedule":
+            values = self.schedules.values
+            return view["schedule"].astype(np.int64), len(values), values.__getitem__
+
+        days = view["date"] // DAY_US
+        if dimension == "day":
+            units = days
+            label = lambda unit: EPOCH + timedelta(days=int(unit))
+        elif dimension == "week":
+            # 1970-01-01 was a Thursday: shift by 3 days so weeks start on Monday
+            units = (days + 3) // 7
+            label = lambda unit: EPOCH + timedelta(days=int(unit) * 7 - 3)
+        else:
+            units = view["date"].astype("datetime64[us]").astype("datetime64[M]").astype(np.int64)
+            label = lambda unit: date(1970 + int(unit) // 12, int(unit) % 12 + 1, 1)
+        if not len(units):
+            return units, 0, label
+        low = int(units.min())
+        return units - low, int(units.max()) - low + 1, lambda code: label(code + low)
+
+    def aggregate(self, group_by: Sequence[str], date_from: Optional[date] = None, date_to: Optional[date] = None,
+                  type: Optional[str] = None, schedule_id: Optional[UUID] = None,
+                  order: str = "key", limit: Optional[int] = None) -> list[dict]:
+        """
+        Count and total quantity per group over the snapshot, optionally filtered;
+        the dates are half-open, date_from <= date < date_to.
+
+        The filters build one boolean mask, the group columns are combined into a
+        single mixed-radix key and the sums come from np.bincount, so the cost is a
+        few passes over the matching rows regardless of the number of groups.
+        """
+        view = self.columns.view()
+        mask = np.ones(self.columns.size, bool)
+        if date_from is not None:
+            mask &= view["date"] >= (date_from - EPOCH).days * DAY_US
+        if date_to is not None:
+            mask &= view["date"] < (date_to - EPOCH).days * DAY_US
+        if type is not None:
+            mask &= view["type"] == self.types.codes.get(recycle_types.cached_id(type), -1)
+        if schedule_id is not None:
+            mask &= view["schedule"] == self.schedules.codes.get(schedule_id, -1)
+        view = {name: array[mask] for name, array in view.items()}
+
+        key = np.zeros(len(view["date"]), np.int64)
+        groups, decoders, radixes = 1, [], []
+        for dimension in group_by:
+            codes, cardinality, decode = self._group_keys(dimension, view)
+            key = key * max(cardinality, 1) + codes
+            groups *= max(cardinality, 1)
+            decoders.append(decode)
+            radixes.append(max(cardinality, 1))
+
+        if groups <= MAX_DENSE_GROUPS:
+            counts = np.bincount(key, minlength=groups)
+            totals = np.bincount(key, weights=view["quantity"], minlength=groups)
+            present = np.flatnonzero(counts)
+            keys, counts, totals = present, counts[present], totals[present]
+        else:
+            keys, inverse = np.unique(key, return_inverse=True)
+            counts = np.bincount(inverse)
+            totals = np.bincount(inverse, weights=view["quantity"])
+
+        if order == "total":
+            ranking = np.argsort(-totals, kind="stable")
+            keys, counts, totals = keys[ranking], counts[ranking], totals[ranking]
+        if limit is not None:
+            keys, counts, totals = keys[:limit], counts[:limit], totals[:limit]
+
+        names = ["schedule_id" if dimension == "schedule" else dimension for dimension in group_by]
+        rows = []
+        for group_key, count, total in zip(keys.tolist(), counts.tolist(), totals.tolist()):
+            row = {}
+            for name, decode, radix in zip(reversed(names), reversed(decoders), reversed(radixes)):
+                group_key, code = divmod(group_key, radix)
+                row[name] = decode(code)
+            rows.append({name: row[name] for name in names} | {"count": count, "total_quantity": total})
+        if order == "key" and any(dimension in ("type", "schedule") for dimension in group_by):
+            # Dictionary codes follow load order; sort by the labels themselves
+            rows.sort(key=lambda row: tuple(str(row[name]) for name in names))
+        return rows
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        loaded = self.columns is not None
+        column_bytes = self.columns.nbytes() if loaded else {}
+        used_bytes = sum(array.itemsize * self.columns.size for array in self.columns.arrays.values()) if loaded else 0
+        # Dictionary entries: key objects plus the dict slots, roughly
+        dictionary_bytes = sum(
+            sum(len(str(value)) + 49 for value in dictionary.codes) + 104 * len(dictionary)
+            for dictionary in (self.types, self.schedules)
+        )
+        return {
+            "enabled": settings.recycle_analytics_enabled,
+            "loaded": loaded,
+            "reloading": self._reload is not None,
+            "rows": self.columns.size if loaded else 0,
+            "capacity": self.columns.capacity if loaded else 0,
+            "types": len(self.types),
+            "schedules": len(self.schedules),
+            "watermark": self.watermark,
+            "memory_bytes": {
+                "columns": column_bytes,
+                "used": used_bytes,
+                "allocated": sum(column_bytes.values()),
+                "dictionaries": dictionary_bytes,
+                "total": sum(column_bytes.values()) + dictionary_bytes,
+            },
+            "seconds_since_load": now - self.loaded_at if loaded else None,
+            "seconds_since_refresh": now - self.refreshed_at if loaded else None,
+            "last_load_ms": self.last_load_ms,
+            "last_refresh_ms": self.last_refresh_ms,
+            **self.counters,
+        }
+
+
+recycle_analytics = RecycleAnalytics(
+    refresh_interval=settings.recycle_analytics_refresh_interval_ms / 1000,
+    full_reload_interval=settings.recycle_analytics_full_reload_s,
+)
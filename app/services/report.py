@@ -1,38 +1,290 @@
+import re
+import zlib
+from typing import Mapping, Optional, Sequence
+from fastapi import HTTPException, status
+from sqlalchemy import and_, bindparam, cast, delete, func, insert, literal, literal_column, or_, update
+from sqlalchemy.dialects.postgresql import REGCONFIG, REAL, TSVECTOR
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models.report import Report
+from app.config import settings
+from app.models.ids import uuid7
+from app.models.report import Report, SEARCH_CONFIG
 from uuid import UUID
 from app.schemas.report import ReportCreate, ReportUpdate
+from app.services.response_cache import bump_version
+
+table = Report.__table__
+
+# Columns that together hold the payload; a projection that asks for `data` selects all
+# three and the payload is decompressed only then, in `decode_report`
+PAYLOAD_COLUMNS = (table.c.data, table.c.data_compressed, table.c.data_codec)
+
+# The stored columns exposed by the API; search_vector is internal
+REPORT_COLUMNS = [table.c.id, table.c.type, table.c.time, *PAYLOAD_COLUMNS]
+
+# ts_headline settings for search snippets: a few short fragments around the matches
+SNIPPET_OPTIONS = "MaxFragments=3, MaxWords=20, MinWords=8, StartSel=<mark>, StopSel=</mark>, FragmentDelimiter= … "
+# ts_headline parses all the text it is given; snippets come from this many leading characters
+SNIPPET_SOURCE_CHARS = 16384
+
+# Columns a caller can project with `fields=`. data_bytes comes from data_size or the
+# TOAST header, so asking for it instead of data never fetches the payload itself.
+REPORT_FIELDS = {
+    "id": (table.c.id,),
+    "type": (table.c.type,),
+    "time": (table.c.time,),
+    "data": PAYLOAD_COLUMNS,
+    "data_bytes": (func.coalesce(table.c.data_size, func.octet_length(table.c.data)).label("data_bytes"),),
+}
+REPORT_SUMMARY_FIELDS = ("id", "type", "time", "data_bytes")
+
+_BYTE_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("The zstd codec needs the zstandard package; install it or use zlib")
+    return zstandard
+
+
+def compress_payload(raw: bytes, codec: str, level: Optional[int] = None) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(raw, 6 if level is None else level)
+    if codec == "zstd":
+        return _zstandard().ZstdCompressor(level=3 if level is None else level).compress(raw)
+    raise ValueError(f"Unknown report codec {codec!r}")
+
+
+def decompress_payload(blob: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(blob)
+    if codec == "zstd":
+        return _zstandard().ZstdDecompressor().decompress(blob)
+    raise ValueError(f"Unknown report codec {codec!r}")
+
+
+def encode_payload(data: str, codec: Optional[str] = None, threshold: Optional[int] = None) -> dict:
+    """
+    Stored column values for a payload: plain text up to the threshold, compressed
+    bytes with their codec and original size above it. Payloads that do not shrink
+    stay plain.
+    """
+    codec = codec or settings.report_compression_codec
+    threshold = settings.report_compression_threshold_bytes if threshold is None else threshold
+    raw = data.encode()
+    if len(raw) > threshold:
+        blob = compress_payload(raw, codec, settings.report_compression_level)
+        if len(blob) < len(raw):
+            return {"data": None, "data_compressed": blob, "data_codec": codec, "data_size": len(raw)}
+    return {"data": data, "data_compressed": None, "data_codec": None, "data_size": None}
+
+
+def decode_report(item: dict) -> dict:
+    """Replace the stored payload columns of a selected row with its `data` text, if they were selected."""
+    if "data_codec" in item:
+        blob, codec = item.pop("data_compressed"), item.pop("data_codec")
+        if codec is not None:
+            item["data"] = decompress_payload(blob, codec).decode()
+    return item
+
+
+def report_payload(row) -> dict:
+    return decode_report(row._asdict())
+
+
+def reports_payload(rows) -> list[dict]:
+    return [report_payload(row) for row in rows]
+
+
+def search_vector(type_, data, previous=None):
+    """
+    The search_vector value for a report: type weighted A, payload words weighted B.
+
+    When only the type changes, pass the current vector as `previous` instead of the
+    payload; its B-weighted part is kept, so a compressed payload need not be read.
+    """
+    config = cast(SEARCH_CONFIG, REGCONFIG)
+    type_part = func.setweight(func.to_tsvector(config, type_), literal_column("'A'"))
+    if previous is not None:
+        data_part = func.ts_filter(previous, literal_column("'{b}'"))
+    else:
+        data_part = func.setweight(func.to_tsvector(config, data), literal_column("'B'"))
+    return type_part.op("||", return_type=TSVECTOR)(data_part)
+
+
+def report_columns(fields: Optional[Sequence[str]] = None) -> list:
+    """Selected columns for a projection (every stored column by default); id is always included."""
+    if not fields:
+        return list(REPORT_COLUMNS)
+    unknown = set(fields) - REPORT_FIELDS.keys()
+    if unknown:
+        raise ValueError(f"Unknown report fields: {', '.join(sorted(unknown))}")
+    names = ["id", *(name for name in dict.fromkeys(fields) if name != "id")]
+    return [column for name in names for column in REPORT_FIELDS[name]]
+
 
 async def create_report(db: AsyncSession, report: ReportCreate):
-    db_report = Report(**report.model_dump())
-    db.add(db_report)
+    values = {"id": uuid7(), **report.model_dump()}
+    stored = {**values, **encode_payload(report.data), "search_vector": search_vector(report.type, report.data)}
+    await db.execute(insert(table).values(**stored))
     await db.commit()
-    await db.refresh(db_report)
-    return db_report
+    await bump_version(db, "reports")
+    return values
+
+async def insert_reports(db: AsyncSession, reports: Sequence[Mapping]):
+    """Insert many reports ({id, type, time, data}) with one executemany, encoding each payload; no commit."""
+    rows = [
+        {"id": report["id"], "type": report["type"], "time": report["time"], **encode_payload(report["data"]),
+         "vector_type": report["type"], "vector_data": report["data"]}
+        for report in reports
+    ]
+    stmt = insert(table).values(search_vector=search_vector(bindparam("vector_type"), bindparam("vector_data")))
+    await db.execute(stmt, rows)
+
+async def get_reports(db: AsyncSession, skip: int = 0, limit: int = 100, fields: Optional[Sequence[str]] = None):
+    # Core column select: plain rows, no ORM identity map, and only the projected columns
+    result = await db.execute(select(*report_columns(fields)).offset(skip).limit(limit))
+    return result.all()
+
+async def get_report_row(db: AsyncSession, report_id: UUID, fields: Optional[Sequence[str]] = None):
+    result = await db.execute(select(*report_columns(fields)).where(table.c.id == report_id))
+    return result.first()
+
+async def search_reports(db: AsyncSession, q: str, limit: int = 20, after: Optional[tuple[float, UUID]] = None):
+    """
+    Reports matching the web-search style query `q`, best match first.
+
+    Matches come from the GIN index on search_vector and are ranked with ts_rank_cd;
+    `after` is the (rank, id) of the last hit of the previous page. Snippets are only
+    built for the rows of the page, from the start of each payload, since ts_headline
+    re-parses its input; a match further in still ranks but may not be highlighted.
+    """
+    config = cast(SEARCH_CONFIG, REGCONFIG)
+    query = func.websearch_to_tsquery(config, q)
+    # Normalization 1 divides by 1 + log(length), so long payloads do not win on size alone
+    rank = func.ts_rank_cd(table.c.search_vector, query, 1)
 
-async def get_reports(db: AsyncSession, skip: int = 0, limit: int = 100):
-    result = await db.execute(select(Report).offset(skip).limit(limit))
-    return result.scalars().all()
+    page = select(table.c.id, rank.label("rank")).where(table.c.search_vector.bool_op("@@")(query))
+    if after is not None:
+        after_rank = cast(after[0], REAL)
+        page = page.where(or_(rank < after_rank, and_(rank == after_rank, table.c.id < after[1])))
+    page = page.order_by(rank.desc(), table.c.id.desc()).limit(limit).subquery()
 
-async def get_report(db: AsyncSession, report_id: UUID):
-    result = await db.execute(select(Report).filter(Report.id == report_id))
-    return result.scalar_one_or_none()
+    # NULL for compressed rows, whose snippets are built below from the inflated text
+    snippet = func.ts_headline(config, func.left(table.c.data, SNIPPET_SOURCE_CHARS), query, SNIPPET_OPTIONS)
+    result = await db.execute(
+        select(table.c.id, table.c.type, table.c.time, page.c.rank, snippet.label("snippet"),
+               table.c.data_compressed, table.c.data_codec)
+        .join(page, page.c.id == table.c.id)
+        .order_by(page.c.rank.desc(), table.c.id.desc())
+    )
+    hits = [row._asdict() for row in result]
+
+    compressed = [hit for hit in hits if hit["data_codec"] is not None]
+    if compressed:
+        texts = [decompress_payload(hit["data_compressed"], hit["data_codec"]).decode()[:SNIPPET_SOURCE_CHARS]
+                 for hit in compressed]
+        result = await db.execute(select(*(func.ts_headline(config, text, query, SNIPPET_OPTIONS) for text in texts)))
+        for hit, snippet_text in zip(compressed, result.one()):
+            hit["snippet"] = snippet_text
+    for hit in hits:
+        del hit["data_compressed"], hit["data_codec"]
+    return hits
+
+def parse_byte_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    Resolve a single-range `Range: bytes=` header against a payload of `size` bytes
+    into an inclusive (first, last) pair.
+
+    Returns None for headers this endpoint does not serve partially (other units,
+    multiple ranges), which are answered with the whole payload. Raises ValueError
+    when the range cannot be satisfied.
+    """
+    match = _BYTE_RANGE.fullmatch(header.strip())
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or last < first:
+        raise ValueError("Unsatisfiable range")
+    return first, last
+
+async def get_report_data(db: AsyncSession, report_id: UUID, byte_range: Optional[str] = None):
+    """
+    A report's payload as UTF-8 bytes, or the part of it named by a `Range` header.
+
+    Returns (content, (first, last) or None, total size), or None if there is no such
+    report. The size is read first, without the payload, so a range over a plain
+    payload only ships the requested slice to the application; compressed payloads
+    are inflated whole and sliced here.
+    """
+    if byte_range is None:
+        row = await get_report_row(db, report_id, ["data"])
+        if row is None:
+            return None
+        content = report_payload(row)["data"].encode()
+        return content, None, len(content)
+
+    result = await db.execute(
+        select(table.c.data_codec, func.coalesce(table.c.data_size, func.octet_length(table.c.data)))
+        .where(table.c.id == report_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    codec, size = row
+    try:
+        bounds = parse_byte_range(byte_range, size)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                            detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    if bounds is None:
+        return await get_report_data(db, report_id)
+
+    first, last = bounds
+    if codec is not None:
+        result = await db.execute(select(table.c.data_compressed).where(table.c.id == report_id))
+        blob = result.scalar_one_or_none()
+        return (decompress_payload(blob, codec)[first:last + 1], bounds, size) if blob is not None else None
+
+    piece = func.substring(func.convert_to(table.c.data, literal("UTF8")), first + 1, last - first + 1)
+    result = await db.execute(select(piece).where(table.c.id == report_id))
+    content = result.scalar_one_or_none()
+    return (content, bounds, size) if content is not None else None
 
 async def update_report(db: AsyncSession, report_id: UUID, report_update: ReportUpdate):
-    db_report = await get_report(db, report_id)
+    values = report_update.model_dump(exclude_unset=True)
+    if not values:
+        row = await get_report_row(db, report_id)
+        return report_payload(row) if row else None
+
+    if "data" in values:
+        values["search_vector"] = search_vector(values.get("type", table.c.type), values["data"])
+        values.update(encode_payload(values["data"]))
+    elif "type" in values:
+        values["search_vector"] = search_vector(values["type"], None, previous=table.c.search_vector)
+
+    # A single UPDATE ... RETURNING replaces the SELECT, flush and refresh round trips
+    result = await db.execute(update(table).where(table.c.id == report_id).values(**values).returning(*REPORT_COLUMNS))
+    db_report = result.first()
     if db_report:
-        for key, value in report_update.model_dump(exclude_unset=True).items():
-            setattr(db_report, key, value)
         await db.commit()
-        await db.refresh(db_report)
-        return db_report
-    return None
+        await bump_version(db, "reports")
+    return report_payload(db_report) if db_report else None
 
 async def delete_report(db: AsyncSession, report_id: UUID):
-    db_report = await get_report(db, report_id)
+    result = await db.execute(delete(table).where(table.c.id == report_id).returning(*REPORT_COLUMNS))
+    db_report = result.first()
     if db_report:
-        await db.delete(db_report)
         await db.commit()
-        return db_report
-    return None
+        await bump_version(db, "reports")
+    return report_payload(db_report) if db_report else None
@@ -0,0 +1,119 @@
+import logging
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Iterable
+
+from cachetools import LRUCache
+from fastapi import Request, Response, status
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = ("recycles", "reports", "schedules")
+
+# Per-resource versions, shared by every worker through the response_version_*
+# sequences. The services advance them after every committed write; each process
+# picks up the other workers' writes by reading the sequences at most once per
+# interval, so a cached body or a 304 can lag another worker's write by that long.
+_versions = defaultdict(int)
+_bumped_at = defaultdict(lambda: float("-inf"))
+_checked_at = float("-inf")
+
+# Before its first nextval a sequence already reports last_value 1
+_READ_VERSIONS = text(" UNION ALL ".join(
+    f"SELECT '{resource}', CASE WHEN is_called THEN last_value ELSE 0 END FROM response_version_{resource}"
+    for resource in RESOURCES
+))
+
+# Rendered JSON bodies keyed by (path, query, version tag), bounded by total bytes
+_bodies = LRUCache(maxsize=settings.response_cache_max_bytes, getsizeof=len)
+
+
+def _advance(resource: str, version: int):
+    if version <= _versions[resource]:
+        return
+    _versions[resource] = version
+    _bumped_at[resource] = time.monotonic()
+    # Bodies rendered for older versions can never be served again
+    for key in [key for key in _bodies.keys() if any(name == resource for name, _ in key[2])]:
+        _bodies.pop(key, None)
+
+
+async def bump_version(db: AsyncSession, resource: str):
+    """Advance the version of `resource`; call after the write is committed."""
+    try:
+        # Sequences are not transactional: the new value sticks whatever happens to
+        # the transaction this starts on the session
+        _advance(resource, (await db.execute(text(f"SELECT nextval('response_version_{resource}')"))).scalar_one())
+    except Exception:
+        # The write itself went through; other workers notice it at the next write
+        logger.exception("Could not advance the %s response version", resource)
+
+
+async def _refresh_versions():
+    global _checked_at
+    now = time.monotonic()
+    if now - _checked_at < settings.response_cache_version_check_interval_ms / 1000:
+        return
+    _checked_at = now  # Concurrent requests keep using the current versions meanwhile
+    try:
+        async with engine.connect() as conn:
+            for resource, version in await conn.execute(_READ_VERSIONS):
+                _advance(resource, version)
+    except Exception:
+        logger.exception("Could not read the response versions")
+
+
+def version_tag(resources: Iterable[str]) -> tuple:
+    return tuple((resource, _versions[resource]) for resource in resources)
+
+
+def _etag(tag: tuple) -> str:
+    return '"' + ".".join(f"{resource}{version}" for resource, version in tag) + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _recently_bumped(resources: Iterable[str]) -> bool:
+    horizon = time.monotonic() - settings.replica_max_lag_ms / 1000
+    return any(_bumped_at[resource] >= horizon for resource in resources)
+
+
+async def cached_response(request: Request, resources: Iterable[str],
+                          render: Callable[[], Awaitable[bytes]]) -> Response:
+    """
+    Serve a JSON body with an ETag derived from the versions of `resources`.
+
+    A matching If-None-Match is answered with 304 and a cached body is returned as
+    is, both without calling `render`; apart from the periodic version check neither
+    touches the database.
+    """
+    await _refresh_versions()
+    tag = version_tag(resources)
+    if getattr(request.state, "read_from_replica", False) and _recently_bumped(resources):
+        # The replica may not have replayed the latest write yet, so this body must not
+        # be labelled or cached as the current version
+        return Response(content=await render(), media_type="application/json")
+
+    etag = _etag(tag)
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    key = (request.url.path, str(request.query_params), tag)
+    body = _bodies.get(key)
+    if body is None:
+        body = await render()
+        # A write that committed while rendering may not be in the body
+        if version_tag(resources) == tag:
+            _bodies[key] = body
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
@@ -0,0 +1,113 @@
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.recycle_rollup import RecycleDailyRollup
+from app.services.lookups import recycle_types
+
+GROUP_BY_COLUMNS = {
+    "type": RecycleDailyRollup.type_id,
+    "schedule": RecycleDailyRollup.schedule_id,
+    "day": RecycleDailyRollup.day,
+}
+
+
+def rollup_day(value: datetime) -> date:
+    # Rollup days are UTC calendar days, matching the migration's backfill
+    return value.astimezone(timezone.utc).date()
+
+
+class RollupDeltas:
+    """Accumulates quantity/count changes per (day, type_id, schedule_id) before they are written."""
+
+    def __init__(self):
+        self._deltas = defaultdict(lambda: [0.0, 0])
+
+    def add(self, recycle, sign: int = 1):
+        key = (rollup_day(recycle.date), recycle.type_id, recycle.schedule_id)
+        delta = self._deltas[key]
+        delta[0] += sign * recycle.quantity
+        delta[1] += sign
+
+    def items(self):
+        # A stable key order keeps concurrent upserts from locking rows in opposite orders
+        return sorted(
+            ((key, delta) for key, delta in self._deltas.items() if delta[0] or delta[1]),
+            key=lambda item: (item[0][0], item[0][1], str(item[0][2])),
+        )
+
+
+async def apply_rollup_deltas(db: AsyncSession, deltas: RollupDeltas):
+    """Upsert the accumulated deltas into the rollup table inside the caller's transaction."""
+    items = deltas.items()
+    if not items:
+        return
+
+    stmt = insert(RecycleDailyRollup).values([
+        {"day": day, "type_id": type_id, "schedule_id": schedule_id, "total_quantity": quantity, "count": count}
+        for (day, type_id, schedule_id), (quantity, count) in items
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[RecycleDailyRollup.day, RecycleDailyRollup.type_id, RecycleDailyRollup.schedule_id],
+        set_={
+            "total_quantity": RecycleDailyRollup.total_quantity + stmt.excluded.total_quantity,
+            "count": RecycleDailyRollup.count + stmt.excluded.count,
+        },
+    )
+    await db.execute(stmt)
+
+    # Buckets emptied by updates or deletes are removed rather than left at zero
+    emptied = [key for key, (_, count) in items if count < 0]
+    if emptied:
+        await db.execute(
+            delete(RecycleDailyRollup).where(
+                RecycleDailyRollup.count <= 0,
+                tuple_(RecycleDailyRollup.day, RecycleDailyRollup.type_id, RecycleDailyRollup.schedule_id).in_(emptied),
+            )
+        )
+
+
+async def get_recycle_stats(db: AsyncSession, group_by: str, date_from: Optional[date] = None,
+                            date_to: Optional[date] = None) -> list[dict]:
+    """Totals per `group_by` key over the days in [date_from, date_to), from the rollup."""
+    key = GROUP_BY_COLUMNS[group_by]
+    query = (
+        select(
+            key.label("key"),
+            func.sum(RecycleDailyRollup.total_quantity).label("total_quantity"),
+            func.sum(RecycleDailyRollup.count).label("count"),
+        )
+        .group_by(key)
+        .order_by(key)
+    )
+    if date_from is not None:
+        query = query.where(RecycleDailyRollup.day >= date_from)
+    if date_to is not None:
+        query = query.where(RecycleDailyRollup.day < date_to)
+
+    rows = [row._asdict() for row in await db.execute(query)]
+    if group_by == "type":
+        # Grouped on the small integer ids; names come from the cached map and set the order
+        names = await recycle_types.names_for(db, (row["key"] for row in rows))
+        for row in rows:
+            row["key"] = names[row["key"]]
+        rows.sort(key=lambda row: row["key"])
+    return rows
+
+
+def schedule_totals_subquery():
+    """Lifetime recycle_count/total_quantity per schedule, aggregated from the rollup in one GROUP BY."""
+    return (
+        select(
+            RecycleDailyRollup.schedule_id,
+            func.sum(RecycleDailyRollup.count).label("recycle_count"),
+            func.sum(RecycleDailyRollup.total_quantity).label("total_quantity"),
+        )
+        .group_by(RecycleDailyRollup.schedule_id)
+        .subquery("schedule_totals")
+    )
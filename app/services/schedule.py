@@ -1,30 +1,259 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Collection, Literal, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, delete, func, or_, true, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from uuid import UUID
+from app.config import settings
+from app.metrics import SCHEDULE_ADVANCE_LAG
+from app.models.changes import CHANGE_COLUMNS
+from app.models.recycle import Recycle
 from app.models.schedule import Schedule
-from app.schemas.schedule import ScheduleCreate, ScheduleUpdate, ScheduleOut
+from app.services.export import ExportFormat, stream_rows
+from app.services.schedule_cache import invalidate_schedule
+from app.services.response_cache import bump_version
+from app.services.recurrence import expand_occurrences, schedule_next_run
+from app.services.recycle import RECYCLE_COLUMNS, RECYCLE_NAMES
+from app.services.rollup import schedule_totals_subquery
+from app.services.lookups import decode_names, schedule_days, schedule_frequencies
+from app.services.serialization import rows_payload
+from app.schemas.schedule import ScheduleCreate, ScheduleUpdate, ScheduleOut, SCHEDULE_RECYCLES_LIMIT
+
+logger = logging.getLogger(__name__)
+
+ScheduleInclude = Literal["recycles", "totals"]
+
+# Whether /schedules/upcoming last found the advance job later than allowed; warns once per episode
+_advance_late = False
+
+# Columns of schedule reads; the stored day_id/frequency_id are mapped to their names
+# by SCHEDULE_NAMES from the lookup caches instead of subqueries per row
+SCHEDULE_COLUMNS = [column for column in Schedule.__table__.c if column.key not in CHANGE_COLUMNS]
+SCHEDULE_NAMES = {"day_id": ("day", schedule_days), "frequency_id": ("frequency", schedule_frequencies)}
+
+
+def _next_run(day: str, frequency: str, anchor: datetime, after: Optional[datetime] = None) -> datetime:
+    try:
+        return schedule_next_run(day, frequency, anchor, after)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+
+
+async def encode_recurrence(db: AsyncSession, values: dict) -> dict:
+    """Replace day/frequency names in `values` by their lookup ids."""
+    for key, lookup in (("day", schedule_days), ("frequency", schedule_frequencies)):
+        if key in values:
+            name = values.pop(key)
+            values[f"{key}_id"] = await lookup.id_for(db, name) if name is not None else None
+    return values
+
+
+
+async def decode_schedule(db: AsyncSession, row) -> ScheduleOut:
+    """ScheduleOut for a row read with the stored ids, e.g. from RETURNING."""
+    values = row._asdict()
+    values["day"] = await schedule_days.name_for(db, values["day_id"])
+    values["frequency"] = await schedule_frequencies.name_for(db, values["frequency_id"])
+    return ScheduleOut.model_validate(values)
+
+
+
+async def _with_recurrence_names(db: AsyncSession, rows) -> list:
+    # Recurrence math needs the names; both maps are filled with one query each at most
+    days = await schedule_days.names_for(db, (row.day_id for row in rows))
+    frequencies = await schedule_frequencies.names_for(db, (row.frequency_id for row in rows))
+    return [(row, days[row.day_id], frequencies[row.frequency_id]) for row in rows]
+
 
 
 async def create_schedule(db: AsyncSession, schedule: ScheduleCreate):
-    db_schedule = Schedule(**schedule.model_dump())
+    db_schedule = Schedule(**await encode_recurrence(db, schedule.model_dump()))
+    db_schedule.next_run_at = _next_run(schedule.day, schedule.frequency, schedule.time)
     db.add(db_schedule)
     await db.commit()
+    await bump_version(db, "schedules")
     await db.refresh(db_schedule)
+    invalidate_schedule(db_schedule.id)
     return db_schedule
 
 
 
-async def get_all_schedules(db: AsyncSession):
-    result = await db.execute(select(Schedule))
-    schedules = result.scalars().all()  # Extracts the actual objects from the result
-    return [ScheduleOut.from_orm(schedule) for schedule in schedules]
+def _schedules_query(include: Collection[ScheduleInclude] = ()):
+    # Core column select: plain rows, no ORM identity map or per-row model validation
+    query = select(*SCHEDULE_COLUMNS)
+
+    if "totals" in include:
+        totals = schedule_totals_subquery()
+        query = query.outerjoin(totals, totals.c.schedule_id == Schedule.id).add_columns(
+            func.coalesce(totals.c.recycle_count, 0).label("recycle_count"),
+            func.coalesce(totals.c.total_quantity, 0.0).label("total_quantity"),
+        )
+    return query
+
+
+
+async def schedules_payload(db: AsyncSession, rows, include: Collection[ScheduleInclude] = ()) -> list[dict]:
+    """Plain dicts for rows returned by the schedule list/detail queries, ready for `to_json`."""
+    payload = await decode_names(db, rows_payload(rows), SCHEDULE_NAMES)
+    if "recycles" not in include or not payload:
+        return payload
+
+    # The newest logs of every schedule in one query: a LATERAL subquery per schedule
+    # that stops after SCHEDULE_RECYCLES_LIMIT rows of ix_recycle_schedule_id_date
+    schedule_ids = select(Schedule.id).where(Schedule.id.in_([schedule["id"] for schedule in payload])).subquery()
+    logs = (
+        select(*RECYCLE_COLUMNS)
+        .where(Recycle.schedule_id == schedule_ids.c.id)
+        .order_by(Recycle.date.desc(), Recycle.id.desc())
+        .limit(SCHEDULE_RECYCLES_LIMIT)
+        .lateral()
+    )
+    result = await db.execute(select(logs).select_from(schedule_ids.join(logs, true())))
+    recycles = defaultdict(list)
+    for log in await decode_names(db, rows_payload(result), RECYCLE_NAMES):
+        recycles[log["schedule_id"]].append(log)
+    for schedule in payload:
+        schedule["recycles"] = recycles[schedule["id"]]
+    return payload
+
+
+
+async def get_all_schedules(db: AsyncSession, include: Collection[ScheduleInclude] = ()):
+    result = await db.execute(_schedules_query(include))
+    return result.all()
 
 
 
-async def get_paginated_schedules(db: AsyncSession, skip: int = 0, limit: int = 50) -> list[ScheduleOut]:
-    result = await db.execute(select(Schedule).offset(skip).limit(limit))
-    schedules = result.scalars().all()
-    return [ScheduleOut.from_orm(schedule) for schedule in schedules]
+async def stream_schedules(db: AsyncSession, fmt: ExportFormat) -> AsyncIterator[bytes]:
+    # Core column select: rows go straight to the encoder without ORM objects
+    query = select(*SCHEDULE_COLUMNS).order_by(Schedule.time, Schedule.id)
+    async for chunk in stream_rows(db, query, fmt, SCHEDULE_NAMES):
+        yield chunk
+
+
+
+async def get_paginated_schedules(db: AsyncSession, skip: int = 0, limit: int = 50,
+                                  after: Optional[tuple[datetime, UUID]] = None,
+                                  include: Collection[ScheduleInclude] = ()):
+    # Pages are ordered on (time, id) so that a keyset cursor can resume from the last row
+    query = _schedules_query(include).order_by(Schedule.time, Schedule.id).limit(limit)
+    if after is not None:
+        query = query.where(tuple_(Schedule.time, Schedule.id) > tuple_(*after))
+    else:
+        query = query.offset(skip)
+    result = await db.execute(query)
+    return result.all()
+
+
+
+async def advance_due_schedules(db: AsyncSession, now: datetime, batch_size: int = 1000, missing: bool = False) -> int:
+    """
+    Move every next_run_at that has already passed on to its next occurrence after `now`,
+    one committed batch at a time. With `missing`, schedules without a next_run_at are
+    filled in too. Run by app.maintenance.schedules, not by requests.
+    """
+    table = Schedule.__table__
+    due = table.c.next_run_at < now
+    if missing:
+        due = or_(due, table.c.next_run_at.is_(None))
+    # Guarded on the recurrence it was computed from, so an API update made in the
+    # meantime (which sets its own next_run_at) is left alone
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"), table.c.day_id == bindparam("old_day_id"),
+               table.c.frequency_id == bindparam("old_frequency_id"), table.c.time == bindparam("old_time"))
+        .values(next_run_at=bindparam("next_run_at"))
+    )
+    advanced = 0
+    after = None
+    while True:
+        query = select(table.c.id, table.c.day_id, table.c.time, table.c.frequency_id, table.c.next_run_at).where(due)
+        if after is not None:
+            query = query.where(table.c.id > after)
+        rows = (await db.execute(query.order_by(table.c.id).limit(batch_size))).all()
+        if not rows:
+            break
+        after = rows[-1].id
+
+        updates = []
+        for row, day, frequency in await _with_recurrence_names(db, rows):
+            try:
+                next_run_at = schedule_next_run(day, frequency, row.time, now)
+            except ValueError:
+                next_run_at = None
+            if next_run_at is None and row.next_run_at is None:
+                continue  # Recurrence that does not parse: nothing to change
+            updates.append({"row_id": row.id, "old_day_id": row.day_id, "old_frequency_id": row.frequency_id,
+                            "old_time": row.time, "next_run_at": next_run_at})
+        if updates:
+            await db.execute(statement, updates)
+            await db.commit()
+            advanced += len(updates)
+
+    if advanced:
+        await bump_version(db, "schedules")
+    return advanced
+
+
+
+async def get_upcoming_schedules(db: AsyncSession, window: timedelta, limit: int = 1000) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    end = now + window
+
+    # Range scan on ix_schedules_next_run_at; no other schedule is read
+    query = (
+        select(*SCHEDULE_COLUMNS)
+        .where(Schedule.next_run_at >= now, Schedule.next_run_at < end)
+        .order_by(Schedule.next_run_at, Schedule.id)
+        .limit(limit)
+    )
+    schedules = await decode_names(db, rows_payload((await db.execute(query)).all()), SCHEDULE_NAMES)
+
+    # Schedules whose next run passed since app.maintenance.schedules last advanced
+    # them: their next occurrence is worked out here, without writing it back. Only
+    # runs that passed within the allowed lag, so a stalled job cannot turn this into
+    # a scan of every schedule; the lag itself is reported instead
+    oldest = (await db.execute(select(func.min(Schedule.next_run_at)))).scalar()
+    lag = max((now - oldest).total_seconds(), 0.0) if oldest is not None else 0.0
+    SCHEDULE_ADVANCE_LAG.set(lag)
+    global _advance_late
+    if lag > settings.schedule_advance_max_lag_s and not _advance_late:
+        logger.warning("Schedule next runs are %.0fs overdue; /schedules/upcoming leaves out those older than %ds "
+                       "until app.maintenance.schedules advance runs", lag, settings.schedule_advance_max_lag_s)
+    _advance_late = lag > settings.schedule_advance_max_lag_s
+    overdue = await db.execute(
+        select(*SCHEDULE_COLUMNS)
+        .where(Schedule.next_run_at >= now - timedelta(seconds=settings.schedule_advance_max_lag_s),
+               Schedule.next_run_at < now)
+        .order_by(Schedule.next_run_at, Schedule.id)
+        .limit(limit)
+    )
+    for schedule in await decode_names(db, rows_payload(overdue.all()), SCHEDULE_NAMES):
+        try:
+            schedule["next_run_at"] = schedule_next_run(schedule["day"], schedule["frequency"], schedule["time"], now)
+        except ValueError:
+            continue
+        if schedule["next_run_at"] < end:
+            schedules.append(schedule)
+
+    schedules.sort(key=lambda schedule: (schedule["next_run_at"], schedule["id"]))
+    return schedules[:limit]
+
+
+
+async def get_schedule_occurrences(db: AsyncSession, start: datetime, end: datetime) -> list[dict]:
+    table = Schedule.__table__
+    result = await db.execute(select(table.c.id, table.c.day_id, table.c.frequency_id, table.c.time))
+    rows = await _with_recurrence_names(db, result.all())
+    index, at = expand_occurrences([(day, frequency, row.time) for row, day, frequency in rows], start, end)
+    return [
+        {"schedule_id": rows[position][0].id, "at": occurrence.replace(tzinfo=timezone.utc)}
+        for position, occurrence in zip(index.tolist(), at.tolist())
+    ]
 
 
 
@@ -34,22 +263,54 @@ async def get_schedule(db: AsyncSession, schedule_id: UUID):
 
 
 
+async def get_schedule_detail(db: AsyncSession, schedule_id: UUID,
+                              include: Collection[ScheduleInclude] = ()) -> Optional[dict]:
+    result = await db.execute(_schedules_query(include).where(Schedule.id == schedule_id))
+    payload = await schedules_payload(db, result.all(), include)
+    return payload[0] if payload else None
+
+
+
 async def update_schedule(db: AsyncSession, schedule_id: UUID, schedule_update: ScheduleUpdate):
-    db_schedule = await get_schedule(db, schedule_id)
+    values = schedule_update.model_dump(exclude_unset=True)
+    if not values:
+        return await get_schedule_detail(db, schedule_id)
+
+    # Any change to the recurrence fields re-validates it and moves next_run_at
+    if values.keys() & {"day", "time", "frequency"}:
+        recurrence = {key: values[key] for key in ("day", "time", "frequency") if key in values}
+        if len(recurrence) < 3:
+            current = await db.execute(
+                select(Schedule.day_id, Schedule.time, Schedule.frequency_id).where(Schedule.id == schedule_id)
+            )
+            current = current.all()
+            if not current:
+                return None
+            [(row, day, frequency)] = await _with_recurrence_names(db, current)
+            recurrence = {"day": day, "time": row.time, "frequency": frequency, **recurrence}
+        values["next_run_at"] = _next_run(recurrence["day"], recurrence["frequency"], recurrence["time"])
+    await encode_recurrence(db, values)
+
+    # A single UPDATE ... RETURNING replaces the SELECT, flush and refresh round trips
+    table = Schedule.__table__
+    result = await db.execute(update(table).where(table.c.id == schedule_id).values(**values).returning(*table.c))
+    db_schedule = result.first()
     if db_schedule:
-        for key, value in schedule_update.model_dump(exclude_unset=True).items():
-            setattr(db_schedule, key, value)
         await db.commit()
-        await db.refresh(db_schedule)
-        return db_schedule
+        await bump_version(db, "schedules")
+        invalidate_schedule(schedule_id)
+        return await decode_schedule(db, db_schedule)
     return None
 
 
 
 async def delete_schedule(db: AsyncSession, schedule_id: UUID):
-    db_schedule = await get_schedule(db, schedule_id)
+    table = Schedule.__table__
+    result = await db.execute(delete(table).where(table.c.id == schedule_id).returning(*table.c))
+    db_schedule = result.first()
     if db_schedule:
-        await db.delete(db_schedule)
         await db.commit()
-        return db_schedule
-    return None
\ No newline at end of file
+        await bump_version(db, "schedules")
+        invalidate_schedule(schedule_id)
+        return await decode_schedule(db, db_schedule)
+    return None
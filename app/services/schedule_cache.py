@@ -0,0 +1,69 @@
+from typing import Iterable
+from uuid import UUID
+
+from cachetools import TTLCache
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.schedule import Schedule
+
+# Process-local cache of schedule ids, used to validate recycle foreign keys without a
+# round trip. Each worker keeps its own copy: explicit invalidation only reaches the
+# worker that handled the schedule write, and the TTLs bound staleness everywhere else.
+# The foreign key constraint in the database remains the final check.
+KNOWN_TTL_SECONDS = 300
+MISSING_TTL_SECONDS = 30
+CACHE_MAXSIZE = 10000
+
+_known = TTLCache(maxsize=CACHE_MAXSIZE, ttl=KNOWN_TTL_SECONDS)
+_missing = TTLCache(maxsize=CACHE_MAXSIZE, ttl=MISSING_TTL_SECONDS)
+
+_counters = {"hits": 0, "negative_hits": 0, "misses": 0, "invalidations": 0}
+
+
+async def existing_schedule_ids(db: AsyncSession, schedule_ids: Iterable[UUID]) -> set[UUID]:
+    """Return the subset of `schedule_ids` that exist, querying only the ids not already cached."""
+    found = set()
+    unknown = set()
+    for schedule_id in set(schedule_ids):
+        if schedule_id in _known:
+            _counters["hits"] += 1
+            found.add(schedule_id)
+        elif schedule_id in _missing:
+            _counters["negative_hits"] += 1
+        else:
+            _counters["misses"] += 1
+            unknown.add(schedule_id)
+
+    if unknown:
+        # Only the id column is needed to prove the row exists
+        result = await db.execute(select(Schedule.id).where(Schedule.id.in_(unknown)))
+        existing = set(result.scalars().all())
+        for schedule_id in unknown:
+            if schedule_id in existing:
+                _known[schedule_id] = True
+            else:
+                _missing[schedule_id] = True
+        found |= existing
+
+    return found
+
+
+async def schedule_exists(db: AsyncSession, schedule_id: UUID) -> bool:
+    return schedule_id in await existing_schedule_ids(db, [schedule_id])
+
+
+def invalidate_schedule(schedule_id: UUID):
+    _known.pop(schedule_id, None)
+    _missing.pop(schedule_id, None)
+    _counters["invalidations"] += 1
+
+
+def cache_stats() -> dict:
+    lookups = _counters["hits"] + _counters["negative_hits"] + _counters["misses"]
+    return {
+        **_counters,
+        "hit_ratio": (_counters["hits"] + _counters["negative_hits"]) / lookups if lookups else 0.0,
+        "known_size": len(_known),
+        "missing_size": len(_missing),
+    }
@@ -0,0 +1,21 @@
+from typing import Any, Iterable
+
+from fastapi import Response
+from pydantic_core import to_json
+from sqlalchemy import Row
+
+
+def rows_payload(rows: Iterable[Row]) -> list[dict]:
+    """Plain dicts from Core result rows, ready for `to_json`."""
+    return [row._asdict() for row in rows]
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    """
+    Serialize `payload` once with pydantic-core and return it as is.
+
+    Returning a Response skips FastAPI's response_model validation and its JSON
+    encoder; the `response_model` on the route then only documents the shape. UUIDs
+    and datetimes are encoded the same way the response_model path would.
+    """
+    return Response(content=to_json(payload), status_code=status_code, media_type="application/json")
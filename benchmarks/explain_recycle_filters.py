@@ -0,0 +1,65 @@
+"""
+Check that every recycle filter combination is planned as an index scan.
+
+Sequential scans are disabled for the session so that the plan shows which index the
+planner would use even on a small development table. Exits non-zero if any combination
+falls back to a sequential scan:
+
+    python -m benchmarks.explain_recycle_filters
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from itertools import combinations
+from uuid import uuid4
+
+from sqlalchemy import text
+from sqlalchemy.future import select
+
+from app.database import async_session, engine
+from app.models.recycle import Recycle
+from app.models.schedule import Schedule  # noqa: F401 - registers the Recycle.schedule target
+from app.schemas.recycle import RecycleFilters
+from app.services.pagination import explain
+from app.services.recycle import recycle_filter_clauses
+
+NOW = datetime.now(timezone.utc)
+FILTER_VALUES = {
+    "type": "plastic",
+    "schedule_id": uuid4(),
+    "date_from": NOW - timedelta(days=30),
+    "date_to": NOW,
+}
+
+
+def scan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from scan_nodes(child)
+
+
+async def main() -> int:
+    failures = 0
+    async with async_session() as db:
+        await db.execute(text("SET LOCAL enable_seqscan = off"))
+        for size in range(1, len(FILTER_VALUES) + 1):
+            for names in combinations(FILTER_VALUES, size):
+                filters = RecycleFilters(**{name: FILTER_VALUES[name] for name in names})
+                query = (
+                    select(*Recycle.__table__.c)
+                    .where(*recycle_filter_clauses(filters))
+                    .order_by(Recycle.date, Recycle.id)
+                    .limit(50)
+                )
+                plan = await explain(db, query)
+                scans = [node for node in scan_nodes(plan) if node.get("Relation Name") or node.get("Index Name")]
+                indexes = sorted({node["Index Name"] for node in scans if "Index Name" in node})
+                sequential = any(node["Node Type"] == "Seq Scan" for node in scans)
+                failures += sequential
+                print(f"{'FAIL' if sequential else 'ok  '}  {' + '.join(names):<45} {', '.join(indexes) or 'seq scan'}")
+    await engine.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
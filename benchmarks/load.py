@@ -0,0 +1,271 @@
+"""
+Concurrent HTTP load against every router, in-process or against a running server.
+
+Without --url the app is driven through httpx's ASGI transport in this process, so
+no server is needed. With --url the same mix runs against uvicorn. Seed the
+database first (benchmarks.seed); queries per request are taken from the app's
+/metrics endpoint before and after the run:
+
+    python -m benchmarks.load --requests 5000 --concurrency 16 --save benchmarks/results/baseline.json
+    python -m benchmarks.load --requests 5000 --concurrency 16 --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.report import load_summary, print_report, save_summary, summarize
+from benchmarks.seed import RECYCLE_TYPES, REPORT_TYPES, SCHEDULE_PATTERNS, WORDS
+
+# Ids sampled from the seeded data before the run
+SAMPLE_SIZE = 500
+BULK_ROWS = 50
+BATCH_GET_IDS = 25
+
+
+class Context:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.recycles: list[str] = []
+        self.schedules: list[str] = []
+        self.reports: list[str] = []
+        self.created_reports: list[str] = []
+        self.change_tokens: dict[str, str] = {}  # Last /changes token per resource, shared like one syncing client
+
+    def recycle_body(self) -> dict:
+        return {
+            "type": self.rng.choice(list(RECYCLE_TYPES)),
+            "quantity": round(self.rng.gammavariate(2, 5), 2),
+            "date": (datetime.now(timezone.utc) - timedelta(days=self.rng.randint(0, 60))).isoformat(),
+            "schedule_id": self.rng.choice(self.schedules),
+        }
+
+    def date_range(self) -> dict:
+        end = datetime.now(timezone.utc).date() - timedelta(days=self.rng.randint(0, 300))
+        return {"date_from": (end - timedelta(days=30)).isoformat(), "date_to": end.isoformat()}
+
+
+async def list_recycles(client, ctx):
+    params = ctx.rng.choice([{"type": ctx.rng.choice(list(RECYCLE_TYPES)), **ctx.date_range()},
+                             {"schedule_id": ctx.rng.choice(ctx.schedules), **ctx.date_range()}])
+    return await client.get("/recycles/", params=params)
+
+
+async def page_recycles(client, ctx):
+    return await client.get("/recycles/all", params={"limit": 50, "skip": ctx.rng.randint(0, 200)})
+
+
+async def recycle_stats(client, ctx):
+    return await client.get("/recycles/stats", params={"group_by": ctx.rng.choice(["type", "schedule", "day"])})
+
+
+async def read_recycle(client, ctx):
+    return await client.get(f"/recycles/{ctx.rng.choice(ctx.recycles)}")
+
+
+async def create_recycle(client, ctx):
+    return await client.post("/recycles/", json=ctx.recycle_body())
+
+
+async def bulk_recycles(client, ctx):
+    return await client.post("/recycles/bulk", json=[ctx.recycle_body() for _ in range(BULK_ROWS)])
+
+
+async def update_recycle(client, ctx):
+    return await client.put(f"/recycles/{ctx.rng.choice(ctx.recycles)}",
+                            json={"quantity": round(ctx.rng.gammavariate(2, 5), 2)})
+
+
+async def batch_get_recycles(client, ctx):
+    return await client.post("/recycles/batch-get", json={"ids": ctx.rng.sample(ctx.recycles, BATCH_GET_IDS)})
+
+
+async def list_schedules(client, ctx):
+    return await client.get("/schedules/all", params={"limit": 50, "include": "totals"})
+
+
+async def read_schedule(client, ctx):
+    return await client.get(f"/schedules/{ctx.rng.choice(ctx.schedules)}", params={"include": "recycles"})
+
+
+async def upcoming_schedules(client, ctx):
+    return await client.get("/schedules/upcoming", params={"window": "P1D"})
+
+
+async def schedule_occurrences(client, ctx):
+    start = datetime.now(timezone.utc)
+    return await client.get("/schedules/occurrences",
+                            params={"start": start.isoformat(), "end": (start + timedelta(days=30)).isoformat()})
+
+
+async def update_schedule(client, ctx):
+    day, frequency = ctx.rng.choice(SCHEDULE_PATTERNS)
+    return await client.put(f"/schedules/{ctx.rng.choice(ctx.schedules)}", json={"day": day, "frequency": frequency})
+
+
+async def batch_get_schedules(client, ctx):
+    return await client.post("/schedules/batch-get",
+                             json={"ids": ctx.rng.sample(ctx.schedules, min(BATCH_GET_IDS, len(ctx.schedules)))})
+
+
+async def sync_changes(client, ctx):
+    resource = ctx.rng.choice(["recycles", "schedules"])
+    params = {"since": ctx.change_tokens[resource]} if resource in ctx.change_tokens else {}
+    response = await client.get(f"/{resource}/changes", params=params)
+    if response.status_code == 200:
+        ctx.change_tokens[resource] = response.json()["next"]
+    return response
+
+
+async def list_reports(client, ctx):
+    return await client.get("/reports/", params={"limit": 20, "skip": ctx.rng.randint(0, 100)})
+
+
+async def list_report_summaries(client, ctx):
+    return await client.get("/reports/", params={"limit": 100, "view": "summary"})
+
+
+async def read_report_data_range(client, ctx):
+    return await client.get(f"/reports/{ctx.rng.choice(ctx.reports)}/data", headers={"Range": "bytes=0-4095"})
+
+
+async def search_reports(client, ctx):
+    return await client.get("/reports/search", params={"q": " ".join(ctx.rng.sample(WORDS, 2)), "limit": 20})
+
+
+async def read_report(client, ctx):
+    return await client.get(f"/reports/{ctx.rng.choice(ctx.reports)}")
+
+
+async def create_report(client, ctx):
+    response = await client.post("/reports/", json={"type": ctx.rng.choice(REPORT_TYPES),
+                                                    "time": datetime.now(timezone.utc).isoformat(),
+                                                    "data": "{\"entries\": []}"})
+    if response.status_code == 200:
+        ctx.created_reports.append(response.json()["id"])
+    return response
+
+
+async def delete_report(client, ctx):
+    # Only reports created by this run are deleted, so the seeded data stays intact
+    if not ctx.created_reports:
+        return await create_report(client, ctx)
+    return await client.delete(f"/reports/{ctx.created_reports.pop()}")
+
+
+async def batch_get_reports(client, ctx):
+    return await client.post("/reports/batch-get",
+                             json={"ids": ctx.rng.sample(ctx.reports, min(BATCH_GET_IDS, len(ctx.reports)))})
+
+
+# (operation, relative weight): a read-heavy mix with every router and write path represented
+OPERATIONS = [
+    (list_recycles, 10), (page_recycles, 10), (recycle_stats, 5), (read_recycle, 15), (create_recycle, 5),
+    (bulk_recycles, 1), (update_recycle, 3), (batch_get_recycles, 4),
+    (list_schedules, 5), (read_schedule, 8), (upcoming_schedules, 3), (schedule_occurrences, 2),
+    (update_schedule, 1), (batch_get_schedules, 2), (sync_changes, 3),
+    (list_reports, 5), (list_report_summaries, 3), (read_report, 8), (read_report_data_range, 2), (search_reports, 3), (create_report, 2), (delete_report, 1), (batch_get_reports, 2),
+]
+
+
+async def sample_ids(client: httpx.AsyncClient, ctx: Context):
+    recycles = (await client.get("/recycles/all", params={"limit": SAMPLE_SIZE})).json()["recycles"]
+    schedules = (await client.get("/schedules/all", params={"limit": SAMPLE_SIZE})).json()["schedules"]
+    reports = (await client.get("/reports/", params={"limit": SAMPLE_SIZE})).json()
+    ctx.recycles = [row["id"] for row in recycles]
+    ctx.schedules = [row["id"] for row in schedules]
+    ctx.reports = [row["id"] for row in reports]
+    if not (len(ctx.recycles) >= BATCH_GET_IDS and ctx.schedules and ctx.reports):
+        raise SystemExit("Not enough data to drive the load; run `python -m benchmarks.seed` first")
+
+
+async def queries_per_route(client: httpx.AsyncClient) -> dict[str, tuple[float, float]]:
+    """(sum, count) of the queries-per-request histogram for each route, from /metrics."""
+    response = await client.get("/metrics")
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for family in text_string_to_metric_families(response.text):
+        if family.name != "wms_db_queries_per_request":
+            continue
+        for sample in family.samples:
+            if sample.name.endswith("_sum"):
+                totals[sample.labels["route"]][0] = sample.value
+            elif sample.name.endswith("_count"):
+                totals[sample.labels["route"]][1] = sample.value
+    return {route: tuple(values) for route, values in totals.items()}
+
+
+async def run(url: Optional[str], requests: int, concurrency: int, seed: int) -> dict:
+    if url:
+        transport = None
+        base_url = url
+    else:
+        from app.main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://benchmark"
+
+    ctx = Context(random.Random(seed))
+    operations, weights = zip(*OPERATIONS)
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    remaining = requests
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60) as client:
+        await sample_ids(client, ctx)
+        before = await queries_per_route(client)
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                operation = ctx.rng.choices(operations, weights)[0]
+                start = time.perf_counter()
+                response = await operation(client, ctx)
+                samples[operation.__name__].append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors[operation.__name__] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        after = await queries_per_route(client)
+
+    queries = {}
+    for route, (total, count) in after.items():
+        previous_total, previous_count = before.get(route, (0.0, 0.0))
+        if count > previous_count and route != "/metrics":
+            queries[route] = (total - previous_total) / (count - previous_count)
+
+    meta = {"target": url or "in-process", "requests": requests, "concurrency": concurrency, "seed": seed,
+            "started": datetime.now(timezone.utc).isoformat()}
+    return summarize(samples, errors, elapsed, queries, meta)
+
+
+async def main(args):
+    summary = await run(args.url, args.requests, args.concurrency, args.seed)
+    baseline = load_summary(args.baseline) if args.baseline else None
+    print_report(summary, baseline)
+    if args.save:
+        save_summary(summary, args.save)
+        print(f"\nsaved to {args.save}")
+    if not args.url:
+        from app.database import engine
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Base URL of a running server; default drives the app in-process")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", type=Path, help="Write the summary as JSON, e.g. to use as a baseline")
+    parser.add_argument("--baseline", type=Path, help="Summary JSON to compare against")
+    asyncio.run(main(parser.parse_args()))
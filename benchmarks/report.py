@@ -0,0 +1,98 @@
+"""
+Summaries of a load run, saved as JSON and compared against a baseline run.
+
+`benchmarks.load` writes these files; this module prints them and the change from
+a baseline, so a service change can be judged from two runs on the same data set:
+
+    python -m benchmarks.report results.json --baseline baseline.json
+"""
+import argparse
+import json
+import statistics
+from pathlib import Path
+from typing import Optional
+
+# Relative change beyond which a metric is flagged in the comparison
+REGRESSION_THRESHOLD = 0.10
+
+
+def latency_summary(samples: list[float]) -> dict:
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {"p50": value, "p95": value, "p99": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49] * 1000, "p95": cuts[94] * 1000, "p99": cuts[98] * 1000}
+
+
+def summarize(samples: dict[str, list[float]], errors: dict[str, int], elapsed: float,
+              queries: dict[str, float], meta: dict) -> dict:
+    """Build the saved summary: overall and per-operation throughput/latency, and queries per route."""
+    operations = {}
+    for name in sorted(samples):
+        operations[name] = {
+            "count": len(samples[name]),
+            "errors": errors.get(name, 0),
+            "throughput": len(samples[name]) / elapsed,
+            **latency_summary(samples[name]),
+        }
+    everything = [sample for values in samples.values() for sample in values]
+    return {
+        "meta": meta,
+        "elapsed": elapsed,
+        "total": {
+            "count": len(everything),
+            "errors": sum(errors.values()),
+            "throughput": len(everything) / elapsed,
+            **latency_summary(everything),
+        },
+        "operations": operations,
+        "queries_per_request": dict(sorted(queries.items())),
+    }
+
+
+def save_summary(summary: dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(summary, indent=2))
+
+
+def load_summary(path: Path) -> dict:
+    return json.loads(path.read_text())
+
+
+def _change(current: float, previous: Optional[float], lower_is_better: bool = True) -> str:
+    if previous is None:
+        return ""
+    if not previous:
+        return "   n/a"
+    delta = (current - previous) / previous
+    worse = delta > REGRESSION_THRESHOLD if lower_is_better else delta < -REGRESSION_THRESHOLD
+    return f"{delta * 100:+6.1f}%" + (" !" if worse else "")
+
+
+def print_report(summary: dict, baseline: Optional[dict] = None):
+    """Print a run, with the relative change from `baseline` next to each figure ("!" marks regressions)."""
+    base_ops = (baseline or {}).get("operations", {})
+    base_queries = (baseline or {}).get("queries_per_request", {})
+    rows = [("TOTAL", summary["total"], (baseline or {}).get("total"))]
+    rows += [(name, values, base_ops.get(name)) for name, values in summary["operations"].items()]
+
+    print(f"{'operation':<34}{'count':>7}{'err':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, values, base in rows:
+        print(f"{name:<34}{values['count']:>7}{values['errors']:>5}{values['throughput']:>9.1f}"
+              f"{values['p50']:>9.2f}{values['p95']:>9.2f}{values['p99']:>9.2f}")
+        if base is not None:
+            print(f"{'  vs baseline':<46}{_change(values['throughput'], base['throughput'], False):>9}"
+                  f"{_change(values['p50'], base['p50']):>9}{_change(values['p95'], base['p95']):>9}"
+                  f"{_change(values['p99'], base['p99']):>9}")
+
+    print(f"\n{'route':<40}{'queries/request':>16}")
+    for route, value in summary["queries_per_request"].items():
+        print(f"{route:<40}{value:>16.2f}  {_change(value, base_queries.get(route)) if baseline else ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("results", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    args = parser.parse_args()
+    print_report(load_summary(args.results), load_summary(args.baseline) if args.baseline else None)
@@ -0,0 +1,153 @@
+"""
+Disk size, buffer-cache hit rate and read latency of reports, plain vs compressed.
+
+Runs the same read mix over the seeded reports twice: once with every payload
+stored as text and once after the compression backfill. Each phase starts with a
+VACUUM FULL, so sizes are comparable and the phase begins with the table out of
+shared buffers. Reads go through the report service, so decompression is included:
+
+    python -m benchmarks.report_storage --reads 1000 --save benchmarks/results/report_storage.json
+
+The database is left compressed afterwards; `python -m app.maintenance.reports
+decompress` undoes that.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.pool import NullPool
+
+from app.database import build_engine
+from app.maintenance.reports import compress_reports, decompress_reports
+from app.models.report import Report
+from app.services.report import get_report_data, get_report_row, get_reports, report_payload, reports_payload
+from benchmarks.report import latency_summary
+
+SIZE_QUERY = text("""
+    SELECT pg_relation_size(c.oid) AS heap,
+           coalesce(pg_relation_size(c.reltoastrelid), 0) AS toast,
+           pg_indexes_size(c.oid) AS indexes,
+           pg_total_relation_size(c.oid) AS total
+    FROM pg_class c WHERE c.oid = 'reports'::regclass
+""")
+IO_QUERY = text("""
+    SELECT heap_blks_read, heap_blks_hit, coalesce(toast_blks_read, 0) AS toast_blks_read,
+           coalesce(toast_blks_hit, 0) AS toast_blks_hit
+    FROM pg_statio_user_tables WHERE relid = 'reports'::regclass
+""")
+
+
+async def read_mix(db: AsyncSession, ids: list, reads: int, rng: random.Random) -> dict[str, list[float]]:
+    """Full reads, ranged reads and list pages, timed per operation."""
+    async def full(report_id):
+        report_payload(await get_report_row(db, report_id))
+
+    async def ranged(report_id):
+        await get_report_data(db, report_id, "bytes=0-4095")
+
+    async def page(_):
+        reports_payload(await get_reports(db, rng.randint(0, max(len(ids) - 20, 0)), 20))
+
+    async def summary_page(_):
+        await get_reports(db, rng.randint(0, max(len(ids) - 100, 0)), 100, ["id", "type", "time", "data_bytes"])
+
+    operations = [(full, 6), (ranged, 2), (page, 1), (summary_page, 1)]
+    functions, weights = zip(*operations)
+    samples = defaultdict(list)
+    for _ in range(reads):
+        operation = rng.choices(functions, weights)[0]
+        start = time.perf_counter()
+        await operation(rng.choice(ids))
+        samples[operation.__name__].append(time.perf_counter() - start)
+    return samples
+
+
+async def measure(engine, reads: int, seed: int) -> dict:
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM (FULL, ANALYZE) reports"))
+        sizes = dict((await conn.execute(SIZE_QUERY)).one()._mapping)
+        stored = (await conn.execute(text(
+            "SELECT count(*) FILTER (WHERE data_codec IS NOT NULL) AS compressed, count(*) AS total FROM reports"
+        ))).one()
+
+    async with engine.connect() as conn:
+        db = AsyncSession(bind=conn)
+        ids = list((await db.execute(select(Report.__table__.c.id).order_by(Report.__table__.c.id))).scalars())
+        await db.commit()
+        # Block statistics are flushed by each backend; one connection does all the reads
+        before = dict((await conn.execute(IO_QUERY)).one()._mapping)
+        await db.commit()
+        start = time.perf_counter()
+        samples = await read_mix(db, ids, reads, random.Random(seed))
+        elapsed = time.perf_counter() - start
+        await db.commit()
+        await conn.execute(text("SELECT pg_stat_force_next_flush()"))
+        await conn.commit()
+        await asyncio.sleep(0.1)
+        after = dict((await conn.execute(IO_QUERY)).one()._mapping)
+        await conn.commit()
+
+    blocks = {key: after[key] - before[key] for key in after}
+    read = blocks["heap_blks_read"] + blocks["toast_blks_read"]
+    hit = blocks["heap_blks_hit"] + blocks["toast_blks_hit"]
+    return {
+        "reports": stored.total,
+        "compressed": stored.compressed,
+        "size_bytes": sizes,
+        "blocks": blocks,
+        "hit_rate": hit / (hit + read) if hit + read else None,
+        "elapsed": elapsed,
+        "latency_ms": {name: latency_summary(values) for name, values in sorted(samples.items())},
+    }
+
+
+def print_phase(name: str, result: dict, baseline: dict = None):
+    sizes = result["size_bytes"]
+    print(f"\n== {name}: {result['compressed']} of {result['reports']} reports compressed")
+    for key in ("heap", "toast", "indexes", "total"):
+        change = ""
+        if baseline and baseline["size_bytes"][key]:
+            change = f"  ({sizes[key] / baseline['size_bytes'][key] * 100:.0f}% of plain)"
+        print(f"  {key + ' size':<14}{sizes[key] / 1024 / 1024:>10.1f} MB{change}")
+    hit_rate = f"{result['hit_rate'] * 100:.1f}%" if result["hit_rate"] is not None else "n/a"
+    read = result["blocks"]["heap_blks_read"] + result["blocks"]["toast_blks_read"]
+    print(f"  {'cache hits':<14}{hit_rate:>13}  ({read} blocks read outside shared buffers)")
+    print(f"  {'operation':<14}{'p50 ms':>13}{'p95 ms':>9}{'p99 ms':>9}")
+    for operation, values in result["latency_ms"].items():
+        print(f"  {operation:<14}{values['p50']:>13.2f}{values['p95']:>9.2f}{values['p99']:>9.2f}")
+
+
+async def main(args):
+    engine = build_engine(poolclass=NullPool, name="benchmark", statement_timeout_ms=0)
+    try:
+        await decompress_reports(engine)
+        plain = await measure(engine, args.reads, args.seed)
+        print_phase("plain", plain)
+
+        totals = await compress_reports(engine, codec=args.codec)
+        compressed = await measure(engine, args.reads, args.seed)
+        compressed["backfill"] = totals
+        print_phase(f"compressed ({args.codec or 'configured codec'})", compressed, plain)
+
+        if args.save:
+            args.save.parent.mkdir(parents=True, exist_ok=True)
+            args.save.write_text(json.dumps({"plain": plain, "compressed": compressed}, indent=2))
+            print(f"\nsaved to {args.save}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reads", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--codec", choices=["zlib", "zstd"])
+    parser.add_argument("--save", type=Path, help="Write both phases as JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,141 @@
+"""
+Seed a local Postgres with reproducible schedules, recycle logs and reports.
+
+Values are drawn from a seeded RNG, so two runs with the same arguments produce the
+same data set (ids aside). Sizes follow what production data looks like: most
+reports are a few kilobytes of JSON with a long tail of large ones, and recycle
+quantities are skewed towards small loads. The rollup, next_run_at and the stored
+report payloads are filled in as the services would:
+
+    python -m benchmarks.seed --schedules 200 --recycles 200000 --reports 2000 --truncate
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine
+from app.models.ids import uuid7
+from app.models.recycle import Recycle
+from app.models.schedule import Schedule
+from app.services.lookups import recycle_types, schedule_days, schedule_frequencies
+from app.services.recurrence import schedule_next_run
+from app.services.report import insert_reports
+from app.services.rollup import RollupDeltas, apply_rollup_deltas
+
+BATCH_SIZE = 5000
+
+RECYCLE_TYPES = {"plastic": 35, "paper": 25, "glass": 15, "metal": 10, "organic": 10, "e-waste": 5}
+REPORT_TYPES = ["daily", "weekly", "monthly", "incident"]
+SCHEDULE_PATTERNS = [
+    ("Monday", "weekly"), ("Tuesday", "weekly"), ("Wednesday", "biweekly"), ("Thursday", "weekly"),
+    ("Friday", "biweekly"), ("Mon, Thu", "weekly"), ("weekdays", "weekly"), ("weekends", "weekly"),
+    ("daily", "daily"), ("1", "monthly"), ("15", "monthly"), ("28", "quarterly"),
+]
+WORDS = ["bin", "collected", "route", "missed", "contaminated", "overflow", "depot", "sorted",
+         "truck", "pickup", "delay", "street", "cleared", "resident", "kg", "volume"]
+
+# Median report payload in bytes; sizes are log-normal around it and clipped
+REPORT_MEDIAN_BYTES = 4096
+REPORT_MAX_BYTES = 512 * 1024
+
+
+def report_payload(rng: random.Random) -> str:
+    target = min(max(int(rng.lognormvariate(0, 1.2) * REPORT_MEDIAN_BYTES), 256), REPORT_MAX_BYTES)
+    entries, size = [], 2
+    while size < target:
+        entry = {
+            "type": rng.choice(list(RECYCLE_TYPES)),
+            "quantity": round(rng.gammavariate(2, 5), 2),
+            "note": " ".join(rng.choices(WORDS, k=rng.randint(3, 12))),
+        }
+        entries.append(entry)
+        size += len(json.dumps(entry)) + 2
+    return json.dumps({"entries": entries})
+
+
+async def insert_batches(db: AsyncSession, table, rows: list[dict], rollup: bool = False):
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        await db.execute(insert(table), batch)
+        if rollup:
+            deltas = RollupDeltas()
+            for row in batch:
+                deltas.add(SimpleNamespace(**row))
+            await apply_rollup_deltas(db, deltas)
+        await db.commit()
+
+
+async def seed(schedules: int, recycles: int, reports: int, days: int, seed_value: int, truncate: bool):
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+
+    schedule_rows = []
+    for _ in range(schedules):
+        day, frequency = rng.choice(SCHEDULE_PATTERNS)
+        anchor = (now - timedelta(days=rng.randint(0, 365))).replace(hour=rng.randint(6, 18), minute=0,
+                                                                   second=0, microsecond=0)
+        schedule_rows.append({"id": uuid7(), "day": day, "time": anchor, "frequency": frequency,
+                              "next_run_at": schedule_next_run(day, frequency, anchor, now)})
+
+    types, weights = list(RECYCLE_TYPES), list(RECYCLE_TYPES.values())
+    recycle_rows = [
+        {
+            "id": uuid7(),
+            "type": rng.choices(types, weights)[0],
+            "quantity": round(rng.gammavariate(2, 5), 2),
+            "date": now - timedelta(seconds=rng.randint(0, days * 86400)),
+            "schedule_id": rng.choice(schedule_rows)["id"],
+        }
+        for _ in range(recycles if schedule_rows else 0)
+    ]
+
+    report_rows = [
+        {"id": uuid7(), "type": rng.choice(REPORT_TYPES), "time": now - timedelta(seconds=rng.randint(0, days * 86400)),
+         "data": report_payload(rng)}
+        for _ in range(reports)
+    ]
+
+    start = time.perf_counter()
+    async with AsyncSession(engine) as db:
+        if truncate:
+            await db.execute(text("TRUNCATE recycle, recycle_daily_rollup, reports, schedules"))
+            await db.commit()
+        # Names are stored as lookup ids, resolved (and created) once per distinct value
+        for rows, key, lookup in ((schedule_rows, "day", schedule_days), (schedule_rows, "frequency", schedule_frequencies),
+                                  (recycle_rows, "type", recycle_types)):
+            ids = await lookup.ids_for(db, {row[key] for row in rows})
+            for row in rows:
+                row[f"{key}_id"] = ids[row.pop(key)]
+        await insert_batches(db, Schedule.__table__, schedule_rows)
+        await insert_batches(db, Recycle.__table__, recycle_rows, rollup=True)
+        # Through the report service, which compresses large payloads and writes the search vector
+        for start in range(0, len(report_rows), BATCH_SIZE):
+            await insert_reports(db, report_rows[start:start + BATCH_SIZE])
+            await db.commit()
+        await db.execute(text("ANALYZE schedules, recycle, recycle_daily_rollup, reports"))
+        await db.commit()
+    elapsed = time.perf_counter() - start
+
+    report_bytes = sum(len(row["data"]) for row in report_rows)
+    print(f"seeded {len(schedule_rows)} schedules, {len(recycle_rows)} recycles, {len(report_rows)} reports "
+          f"({report_bytes / 1024 / 1024:.1f} MB of report data) in {elapsed:.1f}s")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--schedules", type=int, default=200)
+    parser.add_argument("--recycles", type=int, default=100000)
+    parser.add_argument("--reports", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=730, help="How far back recycle and report dates go")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="Empty the tables first")
+    args = parser.parse_args()
+    asyncio.run(seed(args.schedules, args.recycles, args.reports, args.days, args.seed, args.truncate))
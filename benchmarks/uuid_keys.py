@@ -0,0 +1,76 @@
+"""
+Insert throughput and primary key index size for random (v4) vs time-ordered (v7) UUIDs.
+
+Each scheme gets a scratch table shaped like `recycle`, filled in batches the way the
+bulk endpoint writes. The tables are dropped afterwards:
+
+    python -m benchmarks.uuid_keys --rows 200000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Float, MetaData, String, Table, func, insert, select, text
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import engine
+from app.models.ids import uuid7
+
+BATCH_SIZE = 1000
+
+
+def scratch_table(name: str) -> Table:
+    return Table(
+        name, MetaData(),
+        Column("id", UUID(as_uuid=True), primary_key=True),
+        Column("type", String, nullable=False),
+        Column("quantity", Float, nullable=False),
+        Column("date", DateTime(timezone=True), nullable=False),
+    )
+
+
+async def run(name: str, generate, rows: int) -> dict:
+    table = scratch_table(f"bench_ids_{name}")
+    async with engine.begin() as conn:
+        await conn.run_sync(table.drop, checkfirst=True)
+        await conn.run_sync(table.create)
+
+    now = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    for offset in range(0, rows, BATCH_SIZE):
+        batch = [
+            {"id": generate(), "type": "plastic", "quantity": 1.0, "date": now}
+            for _ in range(min(BATCH_SIZE, rows - offset))
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(table), batch)
+    elapsed = time.perf_counter() - start
+
+    async with engine.begin() as conn:
+        index_bytes = await conn.scalar(select(func.pg_relation_size(f"{table.name}_pkey")))
+        # Leaf density needs the pgstattuple extension; it is reported only when installed
+        leaf_density = None
+        if await conn.scalar(text("SELECT count(*) FROM pg_extension WHERE extname = 'pgstattuple'")):
+            leaf_density = await conn.scalar(
+                text("SELECT avg_leaf_density FROM pgstatindex(:index)"), {"index": f"{table.name}_pkey"}
+            )
+        await conn.run_sync(table.drop)
+
+    return {"rows_per_s": rows / elapsed, "index_mb": index_bytes / 1024 / 1024, "leaf_density": leaf_density}
+
+
+async def main(rows: int):
+    print(f"{'scheme':<8}{'rows/s':>12}{'pk index MB':>14}{'leaf density %':>16}")
+    for name, generate in (("uuid4", uuid.uuid4), ("uuid7", uuid7)):
+        result = await run(name, generate, rows)
+        density = f"{result['leaf_density']:.1f}" if result["leaf_density"] is not None else "n/a"
+        print(f"{name:<8}{result['rows_per_s']:>12.0f}{result['index_mb']:>14.2f}{density:>16}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    asyncio.run(main(parser.parse_args().rows))
@@ -0,0 +1,169 @@
+"""
+Latency of the update/delete service paths against a local Postgres.
+
+Compares the previous ORM pattern (SELECT, mutate, COMMIT, refresh) with the current
+single-statement UPDATE/DELETE ... RETURNING services. Both sides write the same
+derived values (next_run_at, the encoded report payload and its search vector, the
+recycle rollup deltas) and advance the response version, so the difference is only
+the round trips. Run after `alembic upgrade head`:
+
+    python -m benchmarks.write_latency --iterations 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from sqlalchemy.future import select
+
+from app.database import async_session, engine
+from app.models.recycle import Recycle
+from app.models.report import Report
+from app.models.schedule import Schedule
+from app.schemas.recycle import RecycleCreate, RecycleUpdate
+from app.schemas.report import ReportCreate, ReportUpdate
+from app.schemas.schedule import ScheduleCreate, ScheduleUpdate
+from app.services.lookups import schedule_frequencies
+from app.services.recurrence import schedule_next_run
+from app.services.recycle import create_recycle, delete_recycle, update_recycle
+from app.services.report import create_report, delete_report, encode_payload, search_vector, update_report
+from app.services.response_cache import bump_version
+from app.services.rollup import RollupDeltas, apply_rollup_deltas
+from app.services.schedule import create_schedule, delete_schedule, update_schedule
+from app.services.schedule_cache import invalidate_schedule
+
+# Alternating valid recurrences; every update still writes a changed value
+FREQUENCIES = ("weekly", "biweekly")
+QUANTITIES = (1.0, 2.0)
+
+
+async def move_rollup(db, old, new):
+    # What the recycle services do before committing: move the row's rollup contribution
+    deltas = RollupDeltas()
+    if old is not None:
+        deltas.add(old, sign=-1)
+    if new is not None:
+        deltas.add(new)
+    await apply_rollup_deltas(db, deltas)
+
+
+async def orm_update(db, model, row_id, changes, resource, before_commit=None):
+    """`changes(row)` returns the attributes to set, computed from the loaded row."""
+    result = await db.execute(select(model).filter(model.id == row_id))
+    row = result.scalar_one_or_none()
+    old = None
+    if before_commit is not None:
+        old = SimpleNamespace(**{column.key: getattr(row, column.key) for column in model.__table__.c})
+    for key, value in changes(row).items():
+        setattr(row, key, value)
+    if before_commit is not None:
+        await before_commit(db, old, row)
+    await db.commit()
+    await bump_version(db, resource)
+    if resource == "schedules":
+        invalidate_schedule(row_id)
+    await db.refresh(row)
+    return row
+
+
+async def orm_delete(db, model, row_id, resource, before_commit=None):
+    result = await db.execute(select(model).filter(model.id == row_id))
+    row = result.scalar_one_or_none()
+    await db.delete(row)
+    if before_commit is not None:
+        await before_commit(db, row, None)
+    await db.commit()
+    await bump_version(db, resource)
+    if resource == "schedules":
+        invalidate_schedule(row_id)
+    return row
+
+
+def schedule_changes(frequency_ids, frequency):
+    return lambda row: {"frequency_id": frequency_ids[frequency],
+                        "next_run_at": schedule_next_run(row.day, frequency, row.time)}
+
+
+def report_changes(data):
+    return lambda row: {**encode_payload(data), "search_vector": search_vector(row.type, data)}
+
+
+def percentiles(samples: list[float]) -> dict:
+    cuts = statistics.quantiles(samples, n=100)
+    return {"p50": cuts[49] * 1000, "p99": cuts[98] * 1000}
+
+
+async def measure(iterations: int, operation) -> dict:
+    samples = []
+    for i in range(iterations):
+        async with async_session() as db:
+            start = time.perf_counter()
+            await operation(db, i)
+            samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+async def main(iterations: int):
+    now = datetime.now(timezone.utc)
+    async with async_session() as db:
+        schedule = await create_schedule(db, ScheduleCreate(day="Monday", time=now, frequency="weekly"))
+        frequency_ids = await schedule_frequencies.ids_for(db, FREQUENCIES)
+        report = await create_report(db, ReportCreate(type="benchmark", time=now, data="x"))
+        recycle = await create_recycle(db, RecycleCreate(type="benchmark", quantity=1.0, date=now,
+                                                         schedule_id=schedule.id))
+        report_ids, recycle_ids, schedule_ids = [], [], []
+        for _ in range(iterations * 2):
+            report_ids.append((await create_report(db, ReportCreate(type="benchmark", time=now, data="x")))["id"])
+            recycle_ids.append((await create_recycle(db, RecycleCreate(type="benchmark", quantity=1.0, date=now,
+                                                                       schedule_id=schedule.id))).id)
+            schedule_ids.append((await create_schedule(db, ScheduleCreate(day="Monday", time=now,
+                                                                          frequency="weekly"))).id)
+
+    cases = {
+        "update_schedule": (
+            lambda db, i: orm_update(db, Schedule, schedule.id, schedule_changes(frequency_ids, FREQUENCIES[i % 2]),
+                                     "schedules"),
+            lambda db, i: update_schedule(db, schedule.id, ScheduleUpdate(frequency=FREQUENCIES[i % 2])),
+        ),
+        "delete_schedule": (
+            lambda db, i: orm_delete(db, Schedule, schedule_ids[i], "schedules"),
+            lambda db, i: delete_schedule(db, schedule_ids[iterations + i]),
+        ),
+        "update_recycle": (
+            lambda db, i: orm_update(db, Recycle, recycle.id, lambda row: {"quantity": QUANTITIES[i % 2]},
+                                     "recycles", move_rollup),
+            lambda db, i: update_recycle(db, recycle.id, RecycleUpdate(quantity=QUANTITIES[i % 2])),
+        ),
+        "delete_recycle": (
+            lambda db, i: orm_delete(db, Recycle, recycle_ids[i], "recycles", move_rollup),
+            lambda db, i: delete_recycle(db, recycle_ids[iterations + i]),
+        ),
+        "update_report": (
+            lambda db, i: orm_update(db, Report, report["id"], report_changes(f"payload-{i}"), "reports"),
+            lambda db, i: update_report(db, report["id"], ReportUpdate(data=f"payload-{i}")),
+        ),
+        "delete_report": (
+            lambda db, i: orm_delete(db, Report, report_ids[i], "reports"),
+            lambda db, i: delete_report(db, report_ids[iterations + i]),
+        ),
+    }
+
+    print(f"{'operation':<18}{'before p50':>12}{'before p99':>12}{'after p50':>12}{'after p99':>12}  (ms)")
+    for name, (before, after) in cases.items():
+        old = await measure(iterations, before)
+        new = await measure(iterations, after)
+        print(f"{name:<18}{old['p50']:>12.3f}{old['p99']:>12.3f}{new['p50']:>12.3f}{new['p99']:>12.3f}")
+
+    async with async_session() as db:
+        await delete_report(db, report["id"])
+        await delete_recycle(db, recycle.id)
+        await delete_schedule(db, schedule.id)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=500)
+    asyncio.run(main(parser.parse_args().iterations))
@@ -1,23 +1,12 @@
 # update_database.py
 
 import asyncio
-from sqlalchemy import create_engine, Column, String, Float, DateTime, UUID, ForeignKey
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.future import select
 
-from app.database import DATABASE_URL  # Your async database URL
+from app.database import async_session as Session  # Shared engine and session factory
 from app.models.recycle import Recycle
 from app.models.schedule import Schedule
 
-# Define your models
-Base = declarative_base()
-
-# Use AsyncSession and create_async_engine for async operations
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
-Session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-
 async def update_database():
     async with Session() as session:
         try: